@@ -0,0 +1,131 @@
+import argparse
+import contextlib
+import json
+import sys
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from core.ProjectAnalyzer import ProjectAnalyzer, has_failed_measurement
+from core.cache.ResultCache import ResultCache
+from core.mining.ParallelCommitMiner import ParallelCommitMiner
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Identify the changed Terraform blocks of commits and stream them as JSON lines."
+    )
+    parser.add_argument("commits", nargs="*",
+                        help="Commit hashes or revision ranges (e.g. v1.0..main). Read from stdin if omitted.")
+    parser.add_argument("--project", required=True, help="Project name, e.g. TFDefect/trivial-tf-changes")
+    parser.add_argument("--repo-url", help="Remote URL of the repository (default: the GitHub URL of the project)")
+    parser.add_argument("--local-path", default="clones", help="Directory where the repository is stored/cloned")
+    parser.add_argument("--clone", action="store_true", help="Clone the repository if it is not available locally")
+    parser.add_argument("--commits-file", help="File with one commit hash or revision range per line ('-' for stdin)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (default: 1)")
+    parser.add_argument("--max-pending", type=int, help="Maximum number of commits in flight (default: 4 per worker)")
+    parser.add_argument("--prescan", action="store_true",
+                        help="Expand revision ranges to the commits worth analysis only, without loading their diffs")
+    parser.add_argument("--result-cache", help="SQLite database caching the changed blocks of analyzed commits")
+    parser.add_argument("--granularity", choices=["block", "file"], default="block",
+                        help="Emit one JSON line per changed block or per changed file (default: block)")
+    return parser.parse_args(argv)
+
+
+def read_commit_specs(args) -> Iterator[str]:
+    yield from args.commits
+
+    source = None
+    if args.commits_file == "-" or (args.commits_file is None and not args.commits and not sys.stdin.isatty()):
+        source = sys.stdin
+    elif args.commits_file is not None:
+        source = open(args.commits_file)
+
+    if source is not None:
+        with source:
+            for line in source:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield line
+
+
+def expand_commit_specs(projectAnalyzer: ProjectAnalyzer, specs: Iterable[str], prescan: bool = False,
+                        on_error: Optional[Callable[[str, str], None]] = None) -> Iterator[str]:
+    for spec in specs:
+        if ".." not in spec:
+            yield spec
+            continue
+        try:
+            if prescan:
+                commit_hashes = projectAnalyzer.prescan_commits(spec)
+            else:
+                commit_hashes = projectAnalyzer.expand_commit_range(spec)
+        except Exception as e:
+            if on_error is None:
+                raise
+            on_error(spec, f"Invalid revision range: {e}")
+            continue
+        yield from commit_hashes
+
+
+def to_json_lines(project: str, commit_hash: str, changed_blocks: List[dict], granularity: str) -> Iterator[str]:
+    for changed_file in changed_blocks:
+        if granularity == "file":
+            yield json.dumps({"project": project, "commit": commit_hash, **changed_file})
+            continue
+        for block in changed_file["itsChangedBlocks"]:
+            yield json.dumps({
+                "project": project,
+                "commit": commit_hash,
+                "modifiedFilePath": changed_file["modifiedFilePath"],
+                "oldFilePath": changed_file.get("oldFilePath"),
+                "type": block["type"],
+                "block": block["block"],
+                "addedLines": block["addedLines"],
+                "deletedLines": block["deletedLines"],
+                # Tells consumers whether a side of the file is missing because its measurement failed
+                "measurements": changed_file.get("measurements")
+            })
+
+
+def main(argv=None) -> int:
+    args = parse_arguments(argv)
+    repo_url = args.repo_url or f"https://github.com/{args.project}.git"
+
+    # Progress messages go to stderr: stdout only carries JSON lines
+    with contextlib.redirect_stdout(sys.stderr):
+        result_cache = ResultCache(args.result_cache) if args.result_cache else None
+        projectAnalyzer = ProjectAnalyzer(args.project, repo_url, args.local_path, clone_repo=args.clone,
+                                          result_cache=result_cache)
+    miner = ParallelCommitMiner(projectAnalyzer, args.workers, args.max_pending, stdout_to_stderr=True)
+
+    failed_commits = []
+    incomplete_commits = []
+
+    def report_error(commit_hash: str, error: str):
+        # The failure is part of the stream, so that consumers know the commit was not skipped silently
+        sys.stdout.write(json.dumps({"project": args.project, "commit": commit_hash, "error": error}) + "\n")
+        sys.stdout.flush()
+        print(f"❌ {commit_hash}: {error}", file=sys.stderr)
+        failed_commits.append(commit_hash)
+
+    commit_hashes = expand_commit_specs(projectAnalyzer, read_commit_specs(args), args.prescan, report_error)
+    num_commits = 0
+    for commit_hash, changed_blocks in miner.mine(commit_hashes, on_error=report_error):
+        for line in to_json_lines(args.project, commit_hash, changed_blocks, args.granularity):
+            sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+        num_commits += 1
+        if has_failed_measurement(changed_blocks):
+            print(f"⚠️ {commit_hash}: a TerraMetrics measurement did not complete, see its measurements",
+                  file=sys.stderr)
+            incomplete_commits.append(commit_hash)
+
+    print(f"✅ Analyzed {num_commits} commits", file=sys.stderr)
+    if failed_commits:
+        print(f"❌ {len(failed_commits)} commits failed", file=sys.stderr)
+    if incomplete_commits:
+        print(f"⚠️ {len(incomplete_commits)} commits have an incomplete TerraMetrics measurement", file=sys.stderr)
+    return 1 if failed_commits or incomplete_commits else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,8 @@
 import os
 import random
-import numpy as np
-from sklearn.dummy import DummyClassifier
 
 from core.ProjectAnalyzer import ProjectAnalyzer
+from utility.block_features import extract_block_features
 
 if __name__ == '__main__':
     """
@@ -37,26 +36,12 @@ if __name__ == '__main__':
     }
 
     # Extract features (for simplicity, we use the block length as a numeric feature)
-    X = []
-    y = []  # Dummy labels (randomly assigned for testing)
+    X, _ = extract_block_features(changed_blocks)
+    y = [random.choice([0, 1]) for _ in X]  # Dummy labels (0: non-defect, 1: defect)
 
-    for changed_file in changed_blocks:
-        modified_file_path = changed_file["modifiedFilePath"]
-        impacted_blocks = changed_file["itsChangedBlocks"]
-
-        # Filter out fully removed blocks
-        filtered_blocks = [block for block in impacted_blocks if block["type"] != "fully_removed"]
-
-        # Process each block
-        for block in filtered_blocks:
-            block_type = block["type"]
-            block_data = block["block"]
-
-            # Convert block attributes to a numerical feature (length of the block)
-            block_size = block_data["loc"]
-
-            X.append([block_size])  # Use block size as a simple feature
-            y.append(random.choice([0, 1]))  # Dummy labels (0: non-defect, 1: defect)
+    # NumPy and scikit-learn are only imported once the analysis is done
+    import numpy as np
+    from sklearn.dummy import DummyClassifier
 
     # Convert lists to NumPy arrays for sklearn compatibility
     X = np.array(X)
@@ -1,13 +1,42 @@
 import os
 import shutil
 import stat
-from typing import Optional, List
-
-from git import Repo, GitCommandError
-from pydriller import Repository
-from pydriller.domain.commit import Commit
+import time
+from typing import Iterator, Optional, List, TYPE_CHECKING
 
 from core.block_extractor.ImpactedBlockIdentifier import ImpactedBlockIdentifier
+from core.block_extractor.TerraMetricsLoader import TerraMetricsLimits, TerraMetricsLoader
+
+# GitPython and PyDriller are slow to import: they are imported by the methods that need them
+if TYPE_CHECKING:
+    from pydriller import Git
+    from pydriller.domain.commit import Commit
+    from core.cache.ResultCache import ResultCache
+
+# Identifies the shape and semantics of the analysis output in cached results: bump it whenever they change
+ANALYZER_VERSION = "2"
+
+# The measurement statuses of a side that was not measured although it exists: its blocks are missing.
+# Quarantined blobs are included, since the quarantine can be cleared or its threshold raised
+FAILED_MEASUREMENT_STATUSES = ("timeout", "killed", "failed", "quarantined")
+
+
+def has_failed_measurement(changed_blocks: List[dict], statuses=FAILED_MEASUREMENT_STATUSES) -> bool:
+    """
+    Checks whether a TerraMetrics measurement of any changed file of an analysis did not complete.
+
+    Args:
+        changed_blocks (List[dict]): The output of `identify_changed_blocks_from_commit`.
+        statuses: The measurement statuses counted as failures (default: `FAILED_MEASUREMENT_STATUSES`).
+
+    Returns:
+        bool: True if the analysis is incomplete, False otherwise.
+    """
+    return any(
+        measurement["status"] in statuses
+        for changed_file in changed_blocks
+        for measurement in changed_file.get("measurements", {}).values()
+    )
 
 
 class ProjectAnalyzer:
@@ -24,6 +53,9 @@ class ProjectAnalyzer:
         clone_repo (bool): Indicates whether the repository should be cloned.
         file_ext_to_parse (List[str]): The list of file extensions to analyze (default: ["tf"]).
         test_special_commit (Optional[str]): An optional commit hash for testing.
+        work_dir (str): The directory where TerraMetrics temporary files are written (default: "tmp").
+        terrametrics_limits (TerraMetricsLimits): The timeouts and resource limits of TerraMetrics runs.
+        result_cache (Optional[ResultCache]): The persistent cache of the changed blocks of commits.
     """
 
     def __init__(
@@ -33,7 +65,10 @@ class ProjectAnalyzer:
             local_repo_path: str,
             test_special_commit: Optional[str] = None,
             clone_repo: bool = False,
-            file_ext_to_parse: List[str] = ["tf"]
+            file_ext_to_parse: List[str] = ["tf"],
+            work_dir: str = "tmp",
+            terrametrics_limits: Optional[TerraMetricsLimits] = None,
+            result_cache: Optional["ResultCache"] = None
     ):
         """
         Initializes the ProjectAnalyzer class with repository details and configurations.
@@ -45,6 +80,10 @@ class ProjectAnalyzer:
             test_special_commit (Optional[str]): A commit hash for testing (default: None).
             clone_repo (bool): Whether to clone the repository (default: False).
             file_ext_to_parse (List[str]): List of file extensions to parse (default: ["tf"]).
+            work_dir (str): Directory for TerraMetrics temporary files (default: "tmp").
+            terrametrics_limits (Optional[TerraMetricsLimits]): Timeouts and resource limits of
+                                                                TerraMetrics runs (default: TerraMetricsLimits()).
+            result_cache (Optional[ResultCache]): Cache of the changed blocks of commits (default: None, no cache).
 
         Raises:
             Exception: If `clone_repo` is False and the local repository does not exist.
@@ -56,6 +95,10 @@ class ProjectAnalyzer:
         self.clone_repo = clone_repo
         self.file_ext_to_parse = file_ext_to_parse
         self.test_special_commit = test_special_commit
+        self.work_dir = work_dir
+        self.terrametrics_limits = terrametrics_limits or TerraMetricsLimits()
+        self.result_cache = result_cache
+        self.git_handle = None
 
         # Clone repository if required, otherwise verify the local path exists
         if self.clone_repo:
@@ -70,6 +113,8 @@ class ProjectAnalyzer:
         Returns:
             bool: True if cloning is successful or if the repository already exists, False otherwise.
         """
+        from git import Repo, GitCommandError
+
         if not os.path.exists(self.local_repo_path):
             try:
                 print(f"Cloning repository {self.repo_url} into {self.local_repo_path}...")
@@ -114,7 +159,7 @@ class ProjectAnalyzer:
             except Exception as e:
                 print(f"Failed to remove repository: {e}")
 
-    def helper_function_get_specific_modification(self, commit_hash: str) -> Optional[Commit]:
+    def helper_function_get_specific_modification(self, commit_hash: str) -> Optional["Commit"]:
         """
         Retrieves a specific commit from the repository based on its hash.
 
@@ -124,13 +169,31 @@ class ProjectAnalyzer:
         Returns:
             Optional[Commit]: The Commit object if found, otherwise None.
         """
-        repo = Repository(path_to_repo=self.local_repo_path)
+        try:
+            return self.get_git_handle().get_commit(commit_hash)
+        except Exception:
+            return None  # Return None if commit is not found
 
-        for commit in repo.traverse_commits():
-            if commit.hash == commit_hash:
-                return commit  # Return the commit object if found
+    def get_git_handle(self) -> "Git":
+        """
+        Returns a Git handle on the local repository, opening it on first use and reusing it afterwards.
+
+        Returns:
+            Git: The PyDriller Git handle of the repository.
+        """
+        from pydriller import Git
 
-        return None  # Return None if commit is not found
+        attempts = 5
+        while self.git_handle is None:
+            try:
+                self.git_handle = Git(self.local_repo_path)
+            except OSError:
+                # PyDriller writes the repository config on open; concurrent processes may hold its lock
+                attempts -= 1
+                if attempts == 0:
+                    raise
+                time.sleep(0.1)
+        return self.git_handle
 
     def identify_changed_blocks_from_a_tf_file(self, mod) -> List[dict]:
         """
@@ -142,32 +205,238 @@ class ProjectAnalyzer:
         Returns:
             List[dict]: A list of impacted code blocks in the file.
         """
-        impactedBlockIdentifier = ImpactedBlockIdentifier(mod)
+        impactedBlockIdentifier = ImpactedBlockIdentifier(mod, self.work_dir, self.terrametrics_limits)
         return impactedBlockIdentifier.identify_impacted_blocks_in_a_file()
 
-    def identify_changed_block_from_specific_commits(self, commit_hash: str) -> List[dict]:
+    def traverse_commits(self, **kwargs):
+        """
+        Iterates over the commits of the local repository, oldest first.
+
+        Args:
+            **kwargs: Extra filters forwarded to PyDriller's Repository (e.g. `since`, `to_commit`).
+
+        Returns:
+            Generator[Commit]: The commits of the repository.
+        """
+        from pydriller import Repository
+
+        return Repository(path_to_repo=self.local_repo_path, **kwargs).traverse_commits()
+
+    def expand_commit_range(self, revision_range: str) -> List[str]:
+        """
+        Lists the commits of a revision range (e.g. "v1.0..main"), oldest first.
+
+        Args:
+            revision_range (str): A git revision range.
+
+        Returns:
+            List[str]: The hashes of the commits in the range.
+        """
+        return self.get_git_handle().repo.git.rev_list("--reverse", revision_range).split()
+
+    def prescan_commits(self, revision_range: Optional[str] = None, since: Optional[str] = None,
+                        until: Optional[str] = None, filter_messages: bool = True) -> List[str]:
+        """
+        Lists the commits worth a full analysis using only the commit metadata and changed paths:
+        merge commits, revert/merge messages and commits touching only example/test or non-TF files are skipped.
+
+        Args:
+            revision_range (Optional[str]): A git revision range (default: "HEAD").
+            since (Optional[str]): Only commits more recent than this date (any `git log --since` value).
+            until (Optional[str]): Only commits older than this date (any `git log --until` value).
+            filter_messages (bool): Also discard merge/revert commits by message (default: True).
+
+        Returns:
+            List[str]: The hashes of the selected commits, oldest first.
+        """
+        from core.mining.CommitPreScanner import CommitPreScanner
+
+        return CommitPreScanner(self.local_repo_path).select_commit_hashes(revision_range, since, until, filter_messages)
+
+    def sample_commits(self, max_commits: Optional[int] = None, max_seconds: Optional[float] = None,
+                       revision_range: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+                       **sampler_kwargs) -> Iterator[dict]:
+        """
+        Estimates per-commit statistics (e.g. changed blocks) from a stratified sample of the commits,
+        within a commit and/or time budget. See `core.mining.CommitSampler`.
+
+        Args:
+            max_commits (Optional[int]): The maximum number of commits to analyze (default: no limit).
+            max_seconds (Optional[float]): The time budget in seconds (default: no limit).
+            revision_range (Optional[str]): A git revision range (default: "HEAD").
+            since (Optional[str]): Only commits more recent than this date.
+            until (Optional[str]): Only commits older than this date.
+            **sampler_kwargs: Forwarded to `CommitSampler` (metrics, strata, workers, confidence...).
+
+        Returns:
+            Iterator[dict]: Progressively refined estimates with their confidence intervals.
+        """
+        from core.mining.CommitSampler import CommitSampler
+
+        return CommitSampler(self, **sampler_kwargs).iter_estimates(max_commits, max_seconds, revision_range, since,
+                                                                    until)
+
+    def is_file_to_parse(self, path: Optional[str]) -> bool:
+        """
+        Checks whether a file path has one of the extensions listed in `file_ext_to_parse`.
+
+        Args:
+            path (Optional[str]): The file path to check.
+
+        Returns:
+            bool: True if the file should be analyzed, False otherwise.
+        """
+        if path is None:
+            return False
+        return os.path.splitext(path)[1].lstrip(".") in self.file_ext_to_parse
+
+    def identify_changed_blocks_from_commit(self, commit: "Commit", only_files_to_parse: bool = False) -> List[dict]:
+        """
+        Identifies changed blocks from an already loaded commit.
+
+        Args:
+            commit (Commit): The commit to analyze.
+            only_files_to_parse (bool): Skip files whose extension is not in `file_ext_to_parse` (default: False).
+
+        Returns:
+            List[dict]: A list of dictionaries containing modified file paths, their changed blocks
+                        and how both sides of each file were measured.
+        """
+        all_changed_blocks_in_a_commit = []
+
+        for modifiedFile in commit.modified_files:
+            if only_files_to_parse and not self.is_file_to_parse(modifiedFile.new_path or modifiedFile.old_path):
+                continue
+            impactedBlockIdentifier = ImpactedBlockIdentifier(modifiedFile, self.work_dir, self.terrametrics_limits)
+            currentObj = {
+                "modifiedFilePath": modifiedFile.new_path,
+                "oldFilePath": modifiedFile.old_path,
+                "itsChangedBlocks": impactedBlockIdentifier.identify_impacted_blocks_in_a_file(),
+                "measurements": impactedBlockIdentifier.get_measurement_report()
+            }
+            all_changed_blocks_in_a_commit.append(currentObj)
+
+        return all_changed_blocks_in_a_commit
+
+    def identify_blocks_in_snapshot(self, commit_hash: str, keep_staging: bool = False) -> List[dict]:
+        """
+        Measures the blocks of every file of the repository tree at a commit, not only the changed ones.
+        The files matching `file_ext_to_parse` are streamed from the object database into a staging
+        directory (no checkout) and measured with a single TerraMetrics run.
+
+        Args:
+            commit_hash (str): The commit (or any revision) whose tree is measured.
+            keep_staging (bool): Keep the staged files after the measurement (default: False).
+
+        Returns:
+            List[dict]: One entry per file, in the shape of `identify_changed_block_from_specific_commits`;
+                        every block of the file is listed with the type "existing". Files without a
+                        TerraMetrics report are left out with a warning.
+        """
+        from core.block_extractor.TreeSnapshot import TreeSnapshot
+
+        commit_hash = self.get_git_handle().repo.rev_parse(commit_hash).hexsha
+        snapshot = TreeSnapshot(self.local_repo_path, commit_hash, self.work_dir)
+        try:
+            staged_paths = snapshot.stage(self.is_file_to_parse)
+            if not staged_paths:
+                return []
+
+            loader = TerraMetricsLoader(None, self.work_dir, self.terrametrics_limits)
+            measurement = loader.call_service_locator_on_project(snapshot.staging_dir)
+            if measurement["status"] != "ok":
+                print(f"❌ Snapshot of {commit_hash} could not be measured: {measurement['error']}")
+                return []
+            blocks_by_file = loader.split_project_results(measurement["results"], commit_hash)
+        finally:
+            if not keep_staging:
+                snapshot.cleanup()
+
+        unreported_paths = [path for path in staged_paths if path not in blocks_by_file]
+        if unreported_paths:
+            print(f"⚠️ TerraMetrics reported nothing for {len(unreported_paths)} file(s) of the snapshot of "
+                  f"{commit_hash}, leaving them out: {', '.join(unreported_paths)}")
+
+        return [
+            {
+                "modifiedFilePath": path,
+                "oldFilePath": path,
+                "itsChangedBlocks": [{"type": "existing", "block": block} for block in blocks_by_file[path]]
+            }
+            for path in staged_paths if path in blocks_by_file
+        ]
+
+    def identify_changed_block_from_specific_commits(self, commit_hash: str,
+                                                     only_files_to_parse: bool = False) -> List[dict]:
         """
         Identifies changed blocks from a specific commit in the repository.
 
         Args:
             commit_hash (str): The hash of the commit to analyze.
+            only_files_to_parse (bool): Skip files whose extension is not in `file_ext_to_parse` (default: False).
 
         Returns:
             List[dict]: A list of dictionaries containing modified file paths and their changed blocks.
         """
+        if self.result_cache is not None:
+            return self.identify_changed_block_from_cache(commit_hash, only_files_to_parse)
+
         specificCommit = self.helper_function_get_specific_modification(commit_hash)
         if not specificCommit:
             print(f"Commit {commit_hash} not found.")
             return []
 
-        all_changed_blocks_in_a_commit = []
+        return self.identify_changed_blocks_from_commit(specificCommit, only_files_to_parse)
 
-        for modifiedFile in specificCommit.modified_files:
-            impactedBlockPositions = self.identify_changed_blocks_from_a_tf_file(modifiedFile)
-            currentObj = {
-                "modifiedFilePath": modifiedFile.new_path,
-                "itsChangedBlocks": impactedBlockPositions
-            }
-            all_changed_blocks_in_a_commit.append(currentObj)
+    def get_cache_config(self, only_files_to_parse: bool = False) -> dict:
+        """
+        Returns:
+            dict: The configuration that changes the output of the analysis, part of the cache key.
+        """
+        return {"file_ext_to_parse": sorted(self.file_ext_to_parse), "only_files_to_parse": only_files_to_parse}
 
-        return all_changed_blocks_in_a_commit
+    def resolve_commit_hash(self, commit_hash: str) -> Optional[str]:
+        """
+        Resolves a commit hash, abbreviated or not, or any other revision to a full commit hash.
+
+        Returns:
+            Optional[str]: The full commit hash, or None if the revision does not exist.
+        """
+        # Full hashes are looked up too: a well-formed hash may still be missing from the repository
+        try:
+            return self.get_git_handle().repo.commit(commit_hash).hexsha
+        except Exception:
+            return None
+
+    def identify_changed_block_from_cache(self, commit_hash: str, only_files_to_parse: bool = False) -> List[dict]:
+        """
+        Identifies changed blocks from a specific commit, reusing the cached result of the commit if any.
+        Results with a TerraMetrics measurement that failed or was quarantined are not cached, so that they
+        are retried.
+
+        Args:
+            commit_hash (str): The hash of the commit to analyze.
+            only_files_to_parse (bool): Skip files whose extension is not in `file_ext_to_parse` (default: False).
+
+        Returns:
+            List[dict]: A list of dictionaries containing modified file paths and their changed blocks.
+        """
+        full_hash = self.resolve_commit_hash(commit_hash)
+        if full_hash is None:
+            print(f"Commit {commit_hash} not found.")
+            return []
+
+        config = self.get_cache_config(only_files_to_parse)
+        cached = self.result_cache.get(self.repo_url, full_hash, ANALYZER_VERSION, config)
+        if cached is not None:
+            return cached
+
+        specificCommit = self.helper_function_get_specific_modification(full_hash)
+        if not specificCommit:
+            print(f"Commit {commit_hash} not found.")
+            return []
+
+        changed_blocks = self.identify_changed_blocks_from_commit(specificCommit, only_files_to_parse)
+        if not has_failed_measurement(changed_blocks):
+            self.result_cache.put(self.repo_url, full_hash, ANALYZER_VERSION, config, changed_blocks)
+        return changed_blocks
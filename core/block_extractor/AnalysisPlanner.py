@@ -0,0 +1,51 @@
+from typing import TYPE_CHECKING
+
+from core.change.DiffHunkParser import DiffHunkParser
+
+if TYPE_CHECKING:
+    from pydriller import ModifiedFile
+
+
+class AnalysisPlanner:
+    """
+    Decides, before any TerraMetrics run, which sides of a modified file must be measured. The
+    decision only uses the change type and the diff of the file:
+
+    - identical blobs, pure renames and changes of special lines only (comments, empty lines,
+      descriptions, see `SpecialLinesFilter`) cannot impact a block: no side is measured;
+    - an added file has no side before the change, a deleted file no side after it;
+    - any other change measures both sides.
+
+    Changes that open or close a multi-line comment or a heredoc are always measured: they can
+    comment out or restore lines that are not part of the diff.
+    """
+
+    def plan(self, mod: "ModifiedFile", parsed_diff: DiffHunkParser) -> dict:
+        """
+        Plans the measurements of a modified file.
+
+        Args:
+            mod (ModifiedFile): The modified file.
+            parsed_diff (DiffHunkParser): The parsed diff of the file.
+
+        Returns:
+            dict: "measure_before" and "measure_after" (bool), and "reason", which explains the plan.
+        """
+        from pydriller import ModificationType
+
+        # Identical blobs (e.g. a mode change only) and pure renames have an empty diff
+        if not mod.diff:
+            return self.skip("pure rename" if mod.change_type == ModificationType.RENAME else "empty diff")
+
+        if not parsed_diff.added_lines and not parsed_diff.deleted_lines and not parsed_diff.has_multiline_delimiters:
+            return self.skip("only special lines changed")
+
+        if mod.change_type == ModificationType.ADD:
+            return {"measure_before": False, "measure_after": True, "reason": "added file"}
+        if mod.change_type == ModificationType.DELETE:
+            return {"measure_before": True, "measure_after": False, "reason": "deleted file"}
+        return {"measure_before": True, "measure_after": True, "reason": "modified file"}
+
+    @staticmethod
+    def skip(reason: str) -> dict:
+        return {"measure_before": False, "measure_after": False, "reason": reason}
@@ -1,19 +1,26 @@
-from pydriller import ModificationType
-
+from core.block_extractor.AnalysisPlanner import AnalysisPlanner
 from core.block_extractor.TerraMetricsLoader import TerraMetricsLoader
 from core.change.Additions import Additions
+from core.change.DiffHunkParser import DiffHunkParser
 from core.change.Deletions import Deletions
 
 
 class ImpactedBlockIdentifier:
 
-    def __init__(self, mod):
+    def __init__(self, mod, work_dir="tmp", limits=None):
         self.mod = mod
 
-        self.blockLocatorInstance = TerraMetricsLoader(self.mod)
+        self.blockLocatorInstance = TerraMetricsLoader(self.mod, work_dir, limits)
+
+        # Parse the diff once for both sides, then measure only the sides that can change the result
+        self.parsed_diff = DiffHunkParser(self.mod.diff)
+        self.plan = AnalysisPlanner().plan(self.mod, self.parsed_diff)
+        if not (self.plan["measure_before"] or self.plan["measure_after"]):
+            print(f"⏭️ Skipping measurement of {self.mod.new_path or self.mod.old_path}: {self.plan['reason']}")
 
         # status, data after the block changed
-        after = self.blockLocatorInstance.call_service_locator(before=False)
+        self.measurement_after_change = self.measure(before=False)
+        after = self.measurement_after_change["results"]
 
         if after is not None:
 
@@ -32,7 +39,8 @@ class ImpactedBlockIdentifier:
 
 
         # status, data before the block changed
-        before = self.blockLocatorInstance.call_service_locator(before=True)
+        self.measurement_before_change = self.measure(before=True)
+        before = self.measurement_before_change["results"]
 
         if before is not None:
             self.blocks_before_change = before["data"]
@@ -44,6 +52,8 @@ class ImpactedBlockIdentifier:
             self.num_blocks_file_before_change = self.head_before_change["num_blocks"]
 
         else:
+            from pydriller import ModificationType
+
             self.blocks_before_change = []
             if self.mod.change_type == ModificationType.ADD:
                 self.status_before_change = 200
@@ -53,15 +63,31 @@ class ImpactedBlockIdentifier:
             self.num_blocks_file_before_change = 0
 
         # Get added and removed lines_change
-        self.additions = Additions(self.mod)
+        self.additions = Additions(self.mod, parsed_diff=self.parsed_diff)
         self.added_lines = self.additions.get_added_lines_in_a_file()
-        self.added_lines_content = self.additions.get_added_lines_content_in_a_file()
-        self.deletions = Deletions(self.mod)
+        self.deletions = Deletions(self.mod, parsed_diff=self.parsed_diff)
         self.removed_lines = self.deletions.get_deleted_lines_in_a_file()
 
+    def measure(self, before: bool) -> dict:
+        if not self.plan["measure_before" if before else "measure_after"]:
+            return self.blockLocatorInstance.measurement("skipped")
+        return self.blockLocatorInstance.measure(before)
+
+    def get_measurement_report(self):
+        """
+        Summarizes how both sides of the file were measured, without the measured blocks.
+
+        Returns:
+            dict: For "before" and "after", the status, attempts, elapsed time, error and blob digest.
+        """
+        report = {}
+        for side, measurement in (("before", self.measurement_before_change), ("after", self.measurement_after_change)):
+            report[side] = {key: value for key, value in measurement.items() if key != "results"}
+        return report
+
     def is_dict_in_list(self, target_dict, list_of_dicts):
         for d in list_of_dicts:
-            if d["block_identifiers"] == target_dict["block_identifiers"]:
+            if d["block"]["block_identifiers"] == target_dict["block_identifiers"]:
                 return True
         return False
 
@@ -131,4 +157,33 @@ class ImpactedBlockIdentifier:
                 if target_block is not None:
                     impacted_blocks.append({"type": "modified", "block": target_block})
 
+        self.attach_block_churn(impacted_blocks)
         return impacted_blocks
+
+    def attach_block_churn(self, impacted_blocks: List[Dict]):
+        """
+        Adds to each impacted block the number of lines added to its version after the change
+        ("addedLines") and deleted from its version before the change ("deletedLines"). The lines
+        of all the blocks of the file are counted at once, on both sides.
+
+        Args:
+            impacted_blocks (List[Dict]): The impacted blocks, updated in place.
+        """
+        added_lines_per_block = self.additions.count_added_lines_in_blocks(
+            [(block["start_block"], block["end_block"]) for block in self.blocks_after_change], inclusive=True
+        )
+        deleted_lines_per_block = self.deletions.count_deleted_lines_in_blocks(
+            [(block["start_block"], block["end_block"]) for block in self.blocks_before_change], inclusive=True
+        )
+        added_by_block = {id(block): count for block, count in zip(self.blocks_after_change, added_lines_per_block)}
+        deleted_by_block = {id(block): count for block, count in zip(self.blocks_before_change, deleted_lines_per_block)}
+
+        for impacted in impacted_blocks:
+            block = impacted["block"]
+            # Match the reported block with its version on the other side of the change
+            if id(block) in added_by_block:
+                after_block, before_block = block, self.get_block(block, self.blocks_before_change)
+            else:
+                after_block, before_block = self.get_block(block, self.blocks_after_change), block
+            impacted["addedLines"] = added_by_block[id(after_block)] if after_block is not None else 0
+            impacted["deletedLines"] = deleted_by_block[id(before_block)] if before_block is not None else 0
@@ -1,18 +1,162 @@
+import contextlib
+import hashlib
 import json
+import os
+import shutil
 import subprocess
+import time
+from typing import Dict, List, Optional, TYPE_CHECKING
 
-from pydriller import ModifiedFile
+from utility.filter_values import transform_path
+
+if TYPE_CHECKING:
+    from pydriller import ModifiedFile
+
+
+class TerraMetricsLimits:
+    """
+    The resource limits applied to each TerraMetrics run.
+
+    Attributes:
+        timeout_seconds (Optional[float]): Wall-clock limit of a run, after which the JVM is killed.
+        max_heap (Optional[str]): The maximum JVM heap (-Xmx), e.g. "1g".
+        active_processors (Optional[int]): The number of CPUs the JVM sizes its thread pools for.
+        cpu_seconds (Optional[int]): CPU time limit of a run (RLIMIT_CPU, POSIX only).
+        max_retries (int): The number of retries of a run that timed out or was killed.
+        backoff_seconds (float): The delay before the first retry, doubled at each retry.
+        quarantine_path (Optional[str]): The JSON file listing the blobs that timed out or were killed, shared
+                                         by workers.
+        quarantine_after (int): The number of timed-out or killed measurements after which a blob is skipped.
+    """
+
+    def __init__(
+            self,
+            timeout_seconds: Optional[float] = 120.0,
+            max_heap: Optional[str] = "1g",
+            active_processors: Optional[int] = None,
+            cpu_seconds: Optional[int] = None,
+            max_retries: int = 1,
+            backoff_seconds: float = 1.0,
+            quarantine_path: Optional[str] = None,
+            quarantine_after: int = 2
+    ):
+        self.timeout_seconds = timeout_seconds
+        self.max_heap = max_heap
+        self.active_processors = active_processors
+        self.cpu_seconds = cpu_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.quarantine_path = quarantine_path
+        self.quarantine_after = quarantine_after
+
+    def jvm_options(self) -> List[str]:
+        options = []
+        if self.max_heap:
+            options.append(f"-Xmx{self.max_heap}")
+        if self.active_processors:
+            options.append(f"-XX:ActiveProcessorCount={self.active_processors}")
+        return options
+
+    def limit_command(self, command: List[str]) -> List[str]:
+        """
+        Applies the CPU time limit with the `prlimit` command of util-linux, when it is available. Unlike
+        `preexec_fn`, it is safe in processes running threads (e.g. the prediction server).
+        """
+        if self.cpu_seconds is None or shutil.which("prlimit") is None:
+            return command
+        return ["prlimit", f"--cpu={self.cpu_seconds}", "--"] + command
+
+    def preexec_fn(self):
+        """
+        Applies the CPU time limit in the child process where `prlimit` is not available (e.g. macOS). A
+        `preexec_fn` is not safe in a process running threads: it can deadlock the child before the JVM
+        starts. Install util-linux, or do not set `cpu_seconds`, when analyzing from threads.
+        """
+        if self.cpu_seconds is None or os.name != "posix" or shutil.which("prlimit") is not None:
+            return None
+        cpu_seconds = self.cpu_seconds
+
+        def limit_cpu():
+            import resource
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+
+        return limit_cpu
+
+
+class BlobQuarantine:
+    """
+    Counts, per blob (SHA-1 of its content), the TerraMetrics measurements that timed out or were
+    killed (e.g. by the CPU time limit), in a JSON file shared by all the workers. Blobs that failed
+    this way `threshold` times are not measured again.
+
+    Attributes:
+        path (str): The path of the JSON file.
+        threshold (int): The number of timeouts or kills after which a blob is quarantined.
+    """
+
+    def __init__(self, path: str, threshold: int = 2):
+        self.path = path
+        self.threshold = threshold
+
+    def load(self) -> Dict[str, int]:
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def is_quarantined(self, digest: str) -> bool:
+        return self.load().get(digest, 0) >= self.threshold
+
+    @contextlib.contextmanager
+    def locked(self):
+        """
+        Holds an exclusive lock on a file next to the JSON file (POSIX only), so that the timeouts
+        recorded by concurrent workers are never lost between a read and a write.
+        """
+        if os.name != "posix":
+            yield
+            return
+
+        import fcntl
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def record_timeout(self, digest: str):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self.locked():
+            timeouts = self.load()
+            timeouts[digest] = timeouts.get(digest, 0) + 1
+
+            # Write then rename, so that concurrent readers never see a partial file
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as file:
+                json.dump(timeouts, file)
+            os.replace(tmp_path, self.path)
 
 
 class TerraMetricsLoader:
 
-    def __init__(self, mod: ModifiedFile):
+    def __init__(self, mod: "ModifiedFile", work_dir: str = "tmp", limits: Optional[TerraMetricsLimits] = None):
         self.mod = mod
+        self.limits = limits or TerraMetricsLimits()
+        self.quarantine = None
+        if self.limits.quarantine_path is not None:
+            self.quarantine = BlobQuarantine(self.limits.quarantine_path, self.limits.quarantine_after)
         self.tmp = "tmp"
-        self.target = self.tmp + "/code_metrics.json"
+        # Temporary blobs and metrics go to work_dir, so that concurrent workers do not overwrite each other
+        self.work_dir = work_dir
+        self.target = self.work_dir + "/code_metrics.json"
         self.service_locator_jar_path = self.tmp + "/terrametrics_2.2.2.jar"
-        self.tmp_blob_path_after_change = self.tmp + "/temporary_file_after_change.tf"
-        self.tmp_blob_path_before_change = self.tmp + "/temporary_file_before_change.tf"
+        self.tmp_blob_path_after_change = self.work_dir + "/temporary_file_after_change.tf"
+        self.tmp_blob_path_before_change = self.work_dir + "/temporary_file_before_change.tf"
 
     def get_content_file(self, before):
         if before:
@@ -34,52 +178,160 @@ class TerraMetricsLoader:
                 return self.write_blob_to_file(self.tmp_blob_path_after_change, blob)
         return None
 
-    def call_service_locator(self, before):
-        try:
-            # Prepare the command to measure the metrics
-            tempPath = self.save_blob_tmp(before)
+    def measure(self, before: bool) -> dict:
+        """
+        Measures one side of the modified file with TerraMetrics, within the configured limits.
 
-            # print(self.read_blob_from_file(tempPath))
-            if tempPath is None:
-                return None
+        Args:
+            before (bool): Measure the content before the change (True) or after it (False).
+
+        Returns:
+            dict: The structured measurement, see `run_service_locator`. Its status is "missing" when
+                  the side does not exist (added or deleted file) and "quarantined" when the blob
+                  timed out or was killed too often before.
+        """
+        blob = self.get_content_file(before)
+        if blob is None:
+            return self.measurement("missing")
+
+        digest = hashlib.sha1(blob.encode("utf-8")).hexdigest()
+        if self.quarantine is not None and self.quarantine.is_quarantined(digest):
+            print(f"⛔ Skipping quarantined blob {digest}")
+            return self.measurement("quarantined", error=f"blob {digest} is quarantined", blob=digest)
 
-            # prepare the command to be executed
-            print("🔄 Preparing command...")
+        # prepare the command to be executed (it also saves the blob to its temporary file)
+        print("🔄 Preparing command...")
+        try:
             command, args = self.prepareCommand(before)
+        except OSError as e:
+            print(f"❌ Could not write the blob to measure: {e}")
+            return self.measurement("failed", error=str(e), blob=digest)
+        result = self.run_service_locator(command, args["target"])
+        result["blob"] = digest
 
-            if not command or not args.get("target"):
-                raise ValueError("❌ Invalid command or missing target argument")
+        # A blob that exhausted the time or CPU limit would exhaust it again
+        if result["status"] in ("timeout", "killed") and self.quarantine is not None:
+            self.quarantine.record_timeout(digest)
+        return result
 
-            print(f"🚀 Executing command: {' '.join(command)}")
+    def call_service_locator(self, before):
+        """
+        Measures one side of the modified file with TerraMetrics.
+
+        Args:
+            before (bool): Measure the content before the change (True) or after it (False).
+
+        Returns:
+            The TerraMetrics results, or None if the side is missing or could not be measured
+            (see `measure` for the reason).
+        """
+        return self.measure(before)["results"]
+
+    def call_service_locator_on_project(self, project_dir: str):
+        """
+        Measures every Terraform file of a directory with a single TerraMetrics run.
+
+        Args:
+            project_dir (str): The directory to measure.
+
+        Returns:
+            dict: The structured measurement, see `run_service_locator`.
+        """
+        command = ['java'] + self.limits.jvm_options() + ['-jar', self.service_locator_jar_path,
+                                                          "--project", project_dir, "--target", self.target, "-b"]
+        return self.run_service_locator(command, self.target)
+
+    def measurement(self, status: str, results=None, attempts: int = 0, elapsed: float = 0.0,
+                    error: Optional[str] = None, blob: Optional[str] = None) -> dict:
+        return {"status": status, "results": results, "attempts": attempts, "elapsed": elapsed,
+                "error": error, "blob": blob}
 
-            # Run the command and capture output
-            process = subprocess.run(command, capture_output=True, text=True)
+    def run_service_locator(self, command: List[str], target: str) -> dict:
+        """
+        Runs a TerraMetrics command within the configured limits. Runs that time out or are killed
+        by a signal (e.g. the CPU limit) are retried with exponential backoff; a run that exits
+        with an error is not, since TerraMetrics would fail the same way again.
+
+        Args:
+            command (List[str]): The command to run.
+            target (str): The JSON file the command writes its results to.
+
+        Returns:
+            dict: The measurement: "status" ("ok", "timeout", "killed" or "failed"), "results"
+                  (the TerraMetrics results, None unless the status is "ok"), "attempts",
+                  "elapsed" (seconds, all attempts included) and "error".
+        """
+        start = time.monotonic()
+        status, error = "failed", None
+
+        for attempt in range(1, self.limits.max_retries + 2):
+            if attempt > 1:
+                time.sleep(self.limits.backoff_seconds * 2 ** (attempt - 2))
+
+            # A stale target from a previous run must never be read as this run's results
+            if os.path.exists(target):
+                os.remove(target)
 
-            # Debug subprocess output
+            print(f"🚀 Executing command: {' '.join(command)}")
+            try:
+                process = subprocess.run(
+                    self.limits.limit_command(command), capture_output=True, text=True, timeout=self.limits.timeout_seconds,
+                    preexec_fn=self.limits.preexec_fn()
+                )
+            except subprocess.TimeoutExpired:
+                status, error = "timeout", f"timed out after {self.limits.timeout_seconds}s"
+                print(f"⏱️ Service locator {error}")
+                continue
+            except OSError as e:
+                status, error = "failed", str(e)
+                break
+
+            if process.returncode < 0:
+                status, error = "killed", f"killed by signal {-process.returncode}"
+                print(f"❌ Service locator {error}")
+                continue
             if process.returncode != 0:
-                print(f"❌ Error executing service locator: {process.stderr}")
-                return None
+                status, error = "failed", process.stderr.strip()
+                print(f"❌ Error executing service locator: {error}")
+                break
 
             print("✅ Command executed successfully, retrieving results...")
+            results = self.getJsonObjects(target) if os.path.exists(target) else None
+            if results is None:
+                status, error = "failed", "TerraMetrics produced no readable results"
+                break
+            return self.measurement("ok", results, attempt, time.monotonic() - start)
 
-            # Get the results as JSON
-            results = self.getJsonObjects(args["target"])
+        return self.measurement(status, None, attempt, time.monotonic() - start, error)
 
-            # if results:
-            #     print("📌 Results Retrieved:")
-            #     print(json.dumps(results, indent=4))  # Pretty-print JSON results
-            # else:
-            #     print("⚠️ No results found or JSON file is empty.")
+    def split_project_results(self, results, root_dir_name: str) -> Dict[str, List[dict]]:
+        """
+        Groups the blocks of a project measurement by file. With `--project`, TerraMetrics is expected to
+        write a list with one report per measured file: the report of a single file (`head`, `data`,
+        `status`) and its absolute path under `file`. This layout is not verified against a `--project`
+        run of terrametrics_2.2.2.jar yet: anything else is rejected rather than guessed.
 
-            # Clean up temporary files
-            # self.clean_file(self.tmp_blob_path_after_change)
-            # self.clean_file(self.tmp_blob_path_before_change)
-            # self.clean_file(self.target)
+        Args:
+            results: The TerraMetrics results of `call_service_locator_on_project`.
+            root_dir_name (str): The name of the measured directory; reported paths are made relative to it.
 
-            return results
-        except Exception as e:
-            print(f"❌ Error in call_service_locator: {e}")
-            return None
+        Returns:
+            Dict[str, List[dict]]: The blocks of each reported file, keyed by path relative to the measured
+                                   directory. A file without blocks has an empty list.
+
+        Raises:
+            ValueError: If the results are not in this format.
+        """
+        if not isinstance(results, list):
+            raise ValueError("TerraMetrics project results are not a list of per-file reports")
+
+        blocks_by_file = {}
+        for report in results:
+            if not isinstance(report, dict) or not isinstance(report.get("file"), str) \
+                    or not isinstance(report.get("data"), list):
+                raise ValueError("TerraMetrics project report without a file path and its blocks")
+            blocks_by_file[transform_path(report["file"], root_dir_name)] = report["data"]
+        return blocks_by_file
 
     def clean_file(self, file_path):
         # Open the file in write mode, which truncates its content
@@ -109,7 +361,7 @@ class TerraMetricsLoader:
 
         args = {"file": self.save_blob_tmp(before), "target": self.target}
 
-        command = ['java', '-jar', self.service_locator_jar_path]
+        command = ['java'] + self.limits.jvm_options() + ['-jar', self.service_locator_jar_path]
 
         for arg, value in args.items():
             command.append(f"--{arg}")
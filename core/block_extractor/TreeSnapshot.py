@@ -0,0 +1,107 @@
+import os
+import shutil
+import subprocess
+import threading
+from typing import Callable, Iterator, List, Tuple
+
+
+class TreeSnapshot:
+    """
+    Stages the files of a repository tree at a given commit into a directory, reading the blobs
+    straight from the object database: `git ls-tree` lists the tree and a single `git cat-file --batch`
+    process streams the contents. No checkout is needed, so bare and `--no-checkout` clones work.
+
+    Attributes:
+        local_repo_path (str): The path of the local repository.
+        commit_hash (str): The commit whose tree is staged.
+        staging_dir (str): The directory holding the staged files, named after the commit hash.
+    """
+
+    def __init__(self, local_repo_path: str, commit_hash: str, work_dir: str = "tmp"):
+        """
+        Initializes the snapshot without staging anything.
+
+        Args:
+            local_repo_path (str): The path of the local repository.
+            commit_hash (str): The commit whose tree is staged.
+            work_dir (str): The directory under which the staging directory is created (default: "tmp").
+        """
+        self.local_repo_path = local_repo_path
+        self.commit_hash = commit_hash
+        self.staging_dir = os.path.join(work_dir, "snapshots", commit_hash)
+
+    def list_blobs(self) -> Iterator[Tuple[str, str]]:
+        """
+        Lists the files of the tree.
+
+        Returns:
+            Iterator[Tuple[str, str]]: (blob id, path) pairs of the regular files of the tree.
+        """
+        output = subprocess.run(
+            ["git", "-C", self.local_repo_path, "ls-tree", "-r", "-z", "--full-tree", self.commit_hash],
+            capture_output=True, check=True
+        ).stdout
+        for entry in output.split(b"\0"):
+            if not entry:
+                continue
+            meta, path = entry.split(b"\t", 1)
+            mode, object_type, blob_id = meta.split(b" ")
+            # Skip submodules and symbolic links
+            if object_type == b"blob" and mode != b"120000":
+                yield blob_id.decode(), path.decode("utf-8", errors="surrogateescape")
+
+    def stage(self, path_filter: Callable[[str], bool]) -> List[str]:
+        """
+        Writes the files of the tree accepted by `path_filter` into the staging directory.
+
+        Args:
+            path_filter (Callable[[str], bool]): Returns True for the paths to stage.
+
+        Returns:
+            List[str]: The staged paths, relative to the repository root.
+        """
+        self.cleanup()
+        blobs = [(blob_id, path) for blob_id, path in self.list_blobs() if path_filter(path)]
+        if not blobs:
+            os.makedirs(self.staging_dir, exist_ok=True)
+            return []
+
+        process = subprocess.Popen(
+            ["git", "-C", self.local_repo_path, "cat-file", "--batch"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+
+        # Request the blobs from another thread: git answers in order while we read, and writing
+        # every request before reading could fill both pipes
+        def request_blobs():
+            for blob_id, _ in blobs:
+                process.stdin.write(f"{blob_id}\n".encode())
+            process.stdin.close()
+
+        feeder = threading.Thread(target=request_blobs, daemon=True)
+        feeder.start()
+
+        staged = []
+        for blob_id, path in blobs:
+            header = process.stdout.readline().split()
+            size = int(header[2])
+            content = process.stdout.read(size)
+            process.stdout.read(1)  # trailing newline
+
+            target = os.path.join(self.staging_dir, *path.split("/"))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as file:
+                file.write(content)
+            staged.append(path)
+
+        feeder.join()
+        process.stdout.close()
+        process.wait()
+        return staged
+
+    def cleanup(self):
+        """
+        Deletes the staging directory.
+        """
+        if os.path.exists(self.staging_dir):
+            shutil.rmtree(self.staging_dir)
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import List, Optional
+
+
+class ResultCache:
+    """
+    A persistent cache of the changed blocks of commits, shared by all the processes using the
+    same SQLite database. Entries are keyed by (repository, commit hash, analyzer version, filter
+    configuration) and stored as zlib-compressed JSON. Expired entries are dropped when read, and
+    the least recently used entries are evicted when the cache grows beyond its limits.
+
+    Attributes:
+        db_path (str): The path of the SQLite database file.
+        ttl_seconds (Optional[float]): The lifetime of an entry, None for no expiry.
+        max_entries (Optional[int]): The maximum number of entries, None for no limit.
+        max_bytes (Optional[int]): The maximum total size of the compressed entries, None for no limit.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            cache_key TEXT PRIMARY KEY,
+            repository TEXT NOT NULL,
+            commit_hash TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            size INTEGER NOT NULL,
+            payload BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_results_commit ON results (repository, commit_hash);
+        CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed_at);
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        """
+        Opens (and creates if needed) the cache database.
+
+        Args:
+            db_path (str): The path of the SQLite database file.
+            ttl_seconds (Optional[float]): The lifetime of an entry (default: None, no expiry).
+            max_entries (Optional[int]): The maximum number of entries (default: None, no limit).
+            max_bytes (Optional[int]): The maximum total size of the compressed entries (default: None, no limit).
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.connect()
+
+    def connect(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # The connection may be used by another thread than its creator (e.g. a server worker)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.db_path, timeout=30.0, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(self.SCHEMA)
+
+    def get_settings(self) -> dict:
+        """
+        Returns:
+            dict: The constructor arguments of the cache, to open it again in another process.
+        """
+        return {"db_path": self.db_path, "ttl_seconds": self.ttl_seconds, "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes}
+
+    def __getstate__(self):
+        # Unpickled copies receive the settings and open their own connection
+        return self.get_settings()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.connect()
+
+    def close(self):
+        """
+        Closes the connection to the database.
+        """
+        self.connection.close()
+
+    @staticmethod
+    def make_key(repository: str, commit_hash: str, analyzer_version: str, config: dict) -> str:
+        """
+        Computes the key of an entry.
+
+        Args:
+            repository (str): The repository, e.g. its URL.
+            commit_hash (str): The full hash of the commit.
+            analyzer_version (str): The version of the analysis that produced the result.
+            config (dict): The filter configuration of the analysis (JSON-serializable).
+
+        Returns:
+            str: The SHA-256 digest of the key components.
+        """
+        components = json.dumps([repository, commit_hash, analyzer_version, config], sort_keys=True)
+        return hashlib.sha256(components.encode("utf-8")).hexdigest()
+
+    def get(self, repository: str, commit_hash: str, analyzer_version: str, config: dict) -> Optional[List[dict]]:
+        """
+        Looks up the cached result of a commit.
+
+        Returns:
+            Optional[List[dict]]: The cached changed blocks, or None if there is no valid entry.
+        """
+        cache_key = self.make_key(repository, commit_hash, analyzer_version, config)
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT created_at, payload FROM results WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            created_at, payload = row
+            with self.connection:
+                if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                    self.connection.execute("DELETE FROM results WHERE cache_key = ?", (cache_key,))
+                    return None
+                self.connection.execute("UPDATE results SET accessed_at = ? WHERE cache_key = ?", (now, cache_key))
+        return json.loads(zlib.decompress(payload))
+
+    def put(self, repository: str, commit_hash: str, analyzer_version: str, config: dict, result: List[dict]):
+        """
+        Stores the result of a commit, then evicts entries beyond the size limits.
+
+        Args:
+            repository (str): The repository, e.g. its URL.
+            commit_hash (str): The full hash of the commit.
+            analyzer_version (str): The version of the analysis that produced the result.
+            config (dict): The filter configuration of the analysis.
+            result (List[dict]): The changed blocks of the commit.
+        """
+        cache_key = self.make_key(repository, commit_hash, analyzer_version, config)
+        payload = zlib.compress(json.dumps(result, separators=(",", ":")).encode("utf-8"))
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results (cache_key, repository, commit_hash, created_at, accessed_at, size, "
+                "payload) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cache_key, repository, commit_hash, now, now, len(payload), payload)
+            )
+            self.evict()
+
+    def evict(self):
+        if self.max_entries is not None:
+            self.connection.execute(
+                "DELETE FROM results WHERE cache_key NOT IN "
+                "(SELECT cache_key FROM results ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+        if self.max_bytes is not None:
+            # Keep the most recently used entries whose cumulated size fits
+            self.connection.execute(
+                "DELETE FROM results WHERE cache_key IN (SELECT cache_key FROM "
+                "(SELECT cache_key, SUM(size) OVER (ORDER BY accessed_at DESC, cache_key) AS total FROM results) "
+                "WHERE total > ?)",
+                (self.max_bytes,)
+            )
+
+    def invalidate(self, repository: Optional[str] = None, commit_hash: Optional[str] = None) -> int:
+        """
+        Deletes the entries of a repository, of a commit, or of a commit of a repository. Entries of
+        every analyzer version and configuration are deleted.
+
+        Args:
+            repository (Optional[str]): Only the entries of this repository.
+            commit_hash (Optional[str]): Only the entries of this commit.
+
+        Returns:
+            int: The number of deleted entries.
+        """
+        if repository is None and commit_hash is None:
+            raise ValueError("Give a repository and/or a commit hash, or use clear() to empty the cache")
+
+        conditions, parameters = [], []
+        if repository is not None:
+            conditions.append("repository = ?")
+            parameters.append(repository)
+        if commit_hash is not None:
+            conditions.append("commit_hash = ?")
+            parameters.append(commit_hash)
+        with self.lock, self.connection:
+            cursor = self.connection.execute(f"DELETE FROM results WHERE {' AND '.join(conditions)}", parameters)
+        return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        """
+        Deletes the expired entries.
+
+        Returns:
+            int: The number of deleted entries.
+        """
+        if self.ttl_seconds is None:
+            return 0
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "DELETE FROM results WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+        return cursor.rowcount
+
+    def clear(self):
+        """
+        Deletes every entry.
+        """
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM results")
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: The number of entries and their total compressed size in bytes.
+        """
+        with self.lock:
+            entries, size = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {"entries": entries, "bytes": size}
@@ -1,6 +1,9 @@
-from pydriller import ModifiedFile
-from utility.TerraformSpecialCases import UtilityChange
-from utility.filter_values import filter_values_between_start_end
+from typing import List, Optional, Sequence, Tuple, TYPE_CHECKING
+from core.change.DiffHunkParser import DiffHunkParser
+from utility.filter_values import count_values_between_bounds, filter_values_between_start_end
+
+if TYPE_CHECKING:
+    from pydriller import ModifiedFile
 
 
 class Additions:
@@ -12,12 +15,11 @@ class Additions:
         mod (ModifiedFile): An instance of ModifiedFile from PyDriller representing the modified file.
         start (int): The starting line number of a block of interest within the file. Defaults to 0.
         end (int): The ending line number of a block of interest within the file. Defaults to 0.
-        utility (UtilityChange): An instance of UtilityChange for utility operations on changes.
-        added_lines_content (List[str]): Content of the lines that have been added, with special lines excluded.
-        added_lines (List[int]): Line numbers of the lines that have been added.
+        parsed_diff (DiffHunkParser): The parsed diff of the file, with special lines excluded.
+        added_lines (array): Line numbers of the lines that have been added.
     """
 
-    def __init__(self, mod: ModifiedFile, start=0, end=0):
+    def __init__(self, mod: "ModifiedFile", start=0, end=0, parsed_diff: Optional[DiffHunkParser] = None):
         """
         Initializes the Additions object with a ModifiedFile instance and optionally a specific block within the file.
 
@@ -25,15 +27,20 @@ class Additions:
             mod (ModifiedFile): The modified file instance from PyDriller.
             start (int, optional): The start line number of the block. Defaults to 0.
             end (int, optional): The end line number of the block. Defaults to 0.
+            parsed_diff (DiffHunkParser, optional): The already parsed diff of the file, shared with
+                                                    the Deletions of the same file. Defaults to parsing `mod.diff`.
         """
         self.mod = mod
         self.start = start
         self.end = end
-        self.utility = UtilityChange()
-        # Extract and store the content of added lines, excluding special lines like comments or whitespace.
-        self.added_lines_content = self.utility.exclude_special_lines(self.mod.diff_parsed['added'])
+        # Parse the diff once, excluding special lines like comments or whitespace.
+        self.parsed_diff = parsed_diff if parsed_diff is not None else DiffHunkParser(self.mod.diff)
         # Extract just the line numbers of the added lines.
-        self.added_lines = [added[0] for added in self.added_lines_content]
+        self.added_lines = self.parsed_diff.added_lines
+
+    @property
+    def added_lines_content(self):
+        return self.get_added_lines_content_in_a_file()
 
     def get_added_lines_in_a_file(self):
         """
@@ -47,11 +54,14 @@ class Additions:
     def get_added_lines_content_in_a_file(self):
         """
         Retrieves the content of all added lines in the modified file, excluding special lines.
+        The content is only extracted from the diff when it is requested.
 
         Returns:
-            List[str]: A list of strings representing the content of added lines.
+            List[Tuple[int, str]]: The line number and content of each added line.
         """
-        return self.added_lines_content
+        if self.parsed_diff.added_lines_content is None:
+            self.parsed_diff = DiffHunkParser(self.mod.diff, keep_content=True)
+        return self.parsed_diff.added_lines_content
 
     def get_added_lines_in_a_block(self):
         """
@@ -70,3 +80,21 @@ class Additions:
             int: The number of added lines within the specified block.
         """
         return len(self.get_added_lines_in_a_block())
+
+    def count_added_lines_in_blocks(self, ranges: Sequence[Tuple[int, int]], inclusive: bool = False) -> List[int]:
+        """
+        Counts the number of added lines within each of several blocks of the file at once,
+        instead of creating one Additions object per block.
+
+        Args:
+            ranges (Sequence[Tuple[int, int]]): The (start, end) line numbers of each block.
+            inclusive (bool): Count the lines on the block boundaries too (default: False, as
+                              `count_added_lines_in_a_block`).
+
+        Returns:
+            List[int]: The number of added lines within each block, in the order of `ranges`.
+        """
+        if not ranges:
+            return []
+        starts, ends = zip(*ranges)
+        return count_values_between_bounds(self.added_lines, starts, ends, inclusive)
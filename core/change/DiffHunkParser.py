@@ -0,0 +1,93 @@
+import io
+from array import array
+from typing import List, Optional, Tuple
+
+from utility.TerraformSpecialCases import SpecialLinesFilter
+
+
+class DiffHunkParser:
+    """
+    Parses a unified diff in a single streaming pass and keeps, for both sides, the line numbers
+    of the changed lines that are not special lines (empty lines, comments, descriptions).
+    Line numbers are stored as compact integer arrays; the content of the lines is only kept
+    when requested.
+
+    Line numbering follows PyDriller's `ModifiedFile.diff_parsed`: added lines are numbered in
+    the file after the change, deleted lines in the file before the change.
+
+    Attributes:
+        added_lines (array): Line numbers of the added lines, special lines excluded.
+        deleted_lines (array): Line numbers of the deleted lines, special lines excluded.
+        added_lines_content (Optional[List[Tuple[int, str]]]): (line number, content) of the added lines,
+                                                               if `keep_content` is True.
+        deleted_lines_content (Optional[List[Tuple[int, str]]]): (line number, content) of the deleted lines,
+                                                                 if `keep_content` is True.
+        has_multiline_delimiters (bool): Whether a changed line opens or closes a multi-line comment or a
+                                         heredoc, which can change unchanged lines too.
+    """
+
+    def __init__(self, diff: str, keep_content: bool = False):
+        """
+        Parses the diff.
+
+        Args:
+            diff (str): The unified diff of a modified file (PyDriller's `ModifiedFile.diff`).
+            keep_content (bool): Keep the content of the changed lines (default: False).
+        """
+        self.keep_content = keep_content
+        self.added_lines = array("i")
+        self.deleted_lines = array("i")
+        self.added_lines_content: Optional[List[Tuple[int, str]]] = [] if keep_content else None
+        self.deleted_lines_content: Optional[List[Tuple[int, str]]] = [] if keep_content else None
+        self.has_multiline_delimiters = False
+        self.parse(diff or "")
+
+    def parse(self, diff: str):
+        added_filter = SpecialLinesFilter()
+        deleted_filter = SpecialLinesFilter()
+        count_deletions = 0
+        count_additions = 0
+
+        # Iterating over a StringIO yields one line at a time instead of splitting the whole diff
+        for line in io.StringIO(diff):
+            line = line.rstrip()
+            count_deletions += 1
+            count_additions += 1
+
+            if line.startswith("@@"):
+                count_deletions, count_additions = self.get_line_numbers(line)
+
+            if line.startswith(("-", "+")):
+                self.check_multiline_delimiters(line)
+
+            if line.startswith("-"):
+                content = line[1:]
+                if not deleted_filter.is_special(content):
+                    self.deleted_lines.append(count_deletions)
+                    if self.keep_content:
+                        self.deleted_lines_content.append((count_deletions, content))
+                count_additions -= 1
+
+            if line.startswith("+"):
+                content = line[1:]
+                if not added_filter.is_special(content):
+                    self.added_lines.append(count_additions)
+                    if self.keep_content:
+                        self.added_lines_content.append((count_additions, content))
+                count_deletions -= 1
+
+            if line == r"\ No newline at end of file":
+                count_deletions -= 1
+                count_additions -= 1
+
+    def check_multiline_delimiters(self, line: str):
+        if not self.has_multiline_delimiters and ("/*" in line or "*/" in line or "<<" in line):
+            self.has_multiline_delimiters = True
+
+    @staticmethod
+    def get_line_numbers(line: str) -> Tuple[int, int]:
+        # "@@ -old_start,old_count +new_start,new_count @@"
+        token = line.split(" ")
+        delete_line_number = int(token[1].split(",")[0].replace("-", "")) - 1
+        additions_line_number = int(token[2].split(",")[0]) - 1
+        return delete_line_number, additions_line_number
@@ -0,0 +1,277 @@
+import os
+import sqlite3
+from datetime import datetime
+from typing import Optional, List, Union
+
+from core.ProjectAnalyzer import ProjectAnalyzer, has_failed_measurement
+
+
+class BlockLineageIndex:
+    """
+    A persistent, incremental index of the blocks changed by each commit of a repository.
+    Every entry produced by `ImpactedBlockIdentifier` is stored in a SQLite database so that
+    per-block history and churn questions can be answered without re-mining the history.
+
+    Attributes:
+        db_path (str): The path of the SQLite database file.
+        connection (sqlite3.Connection): The open connection to the database.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS indexed_commits (
+            project TEXT NOT NULL,
+            commit_hash TEXT NOT NULL,
+            committed_at INTEGER NOT NULL,
+            PRIMARY KEY (project, commit_hash)
+        );
+        CREATE TABLE IF NOT EXISTS block_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project TEXT NOT NULL,
+            commit_hash TEXT NOT NULL,
+            committed_at INTEGER NOT NULL,
+            file_path TEXT,
+            block_identifiers TEXT NOT NULL,
+            start_block INTEGER,
+            end_block INTEGER,
+            change_type TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_block_changes_block
+            ON block_changes (project, block_identifiers, committed_at);
+        CREATE INDEX IF NOT EXISTS idx_block_changes_file
+            ON block_changes (project, file_path, block_identifiers);
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Opens (and creates if needed) the index database.
+
+        Args:
+            db_path (str): The path of the SQLite database file.
+        """
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(db_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(self.SCHEMA)
+
+    def close(self):
+        """
+        Closes the connection to the database.
+        """
+        self.connection.close()
+
+    @staticmethod
+    def to_timestamp(value: Optional[Union[datetime, int, float]]) -> Optional[int]:
+        """
+        Converts a datetime (or an epoch value) into an integer epoch timestamp.
+
+        Args:
+            value (Optional[Union[datetime, int, float]]): The value to convert.
+
+        Returns:
+            Optional[int]: The epoch timestamp, or None if no value was given.
+        """
+        if value is None:
+            return None
+        if isinstance(value, datetime):
+            return int(value.timestamp())
+        return int(value)
+
+    def is_commit_indexed(self, project: str, commit_hash: str) -> bool:
+        """
+        Checks whether a commit has already been recorded in the index.
+
+        Args:
+            project (str): The name of the project.
+            commit_hash (str): The hash of the commit.
+
+        Returns:
+            bool: True if the commit is already indexed, False otherwise.
+        """
+        row = self.connection.execute(
+            "SELECT 1 FROM indexed_commits WHERE project = ? AND commit_hash = ?",
+            (project, commit_hash)
+        ).fetchone()
+        return row is not None
+
+    def record_commit(self, project: str, commit_hash: str, committed_at: Union[datetime, int],
+                      changed_blocks: List[dict]):
+        """
+        Stores the changed blocks of a commit. The commit is recorded even if no block changed,
+        so that it is not analyzed again on the next update.
+
+        Args:
+            project (str): The name of the project.
+            commit_hash (str): The hash of the commit.
+            committed_at (Union[datetime, int]): The commit date.
+            changed_blocks (List[dict]): The output of `ProjectAnalyzer.identify_changed_blocks_from_commit`.
+        """
+        timestamp = self.to_timestamp(committed_at)
+        rows = []
+        for changed_file in changed_blocks:
+            file_path = changed_file.get("modifiedFilePath") or changed_file.get("oldFilePath")
+            for impacted in changed_file["itsChangedBlocks"]:
+                block = impacted["block"]
+                rows.append((
+                    project, commit_hash, timestamp, file_path, block["block_identifiers"],
+                    block.get("start_block"), block.get("end_block"), impacted["type"]
+                ))
+
+        # One transaction per commit: an interrupted update never leaves a half-indexed commit
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO indexed_commits (project, commit_hash, committed_at) VALUES (?, ?, ?)",
+                (project, commit_hash, timestamp)
+            )
+            self.connection.execute(
+                "DELETE FROM block_changes WHERE project = ? AND commit_hash = ?",
+                (project, commit_hash)
+            )
+            self.connection.executemany(
+                "INSERT INTO block_changes (project, commit_hash, committed_at, file_path, block_identifiers, "
+                "start_block, end_block, change_type) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def update(self, projectAnalyzer: ProjectAnalyzer, max_commits: Optional[int] = None, **kwargs) -> int:
+        """
+        Indexes the commits of a repository that are not in the index yet. Commits with a TerraMetrics
+        measurement that did not complete are left out of the index.
+
+        Args:
+            projectAnalyzer (ProjectAnalyzer): The analyzer of the repository to index.
+            max_commits (Optional[int]): Stop after indexing this many new commits (default: no limit).
+            **kwargs: Extra filters forwarded to `ProjectAnalyzer.traverse_commits`.
+
+        Returns:
+            int: The number of newly indexed commits.
+        """
+        project = projectAnalyzer.projectName
+        indexed = {
+            row["commit_hash"] for row in self.connection.execute(
+                "SELECT commit_hash FROM indexed_commits WHERE project = ?", (project,)
+            )
+        }
+
+        newly_indexed = 0
+        for commit in projectAnalyzer.traverse_commits(**kwargs):
+            if max_commits is not None and newly_indexed >= max_commits:
+                break
+            # PyDriller computes diffs lazily, so skipping a known commit costs nothing
+            if commit.hash in indexed:
+                continue
+
+            changed_blocks = projectAnalyzer.identify_changed_blocks_from_commit(commit, only_files_to_parse=True)
+            # An incomplete analysis is not recorded, so that the commit is analyzed again on the next update
+            if has_failed_measurement(changed_blocks):
+                print(f"⚠️ A TerraMetrics measurement of commit {commit.hash} did not complete, not indexing it")
+                continue
+            self.record_commit(project, commit.hash, commit.committer_date, changed_blocks)
+            newly_indexed += 1
+
+        return newly_indexed
+
+    def build_block_filter(self, project: str, block_identifiers: Optional[str] = None,
+                           file_path: Optional[str] = None, since=None, until=None,
+                           change_types: Optional[List[str]] = None):
+        """
+        Builds the WHERE clause shared by the history and churn queries.
+
+        Returns:
+            Tuple[str, list]: The SQL condition and its parameters.
+        """
+        conditions = ["project = ?"]
+        params = [project]
+        if block_identifiers is not None:
+            conditions.append("block_identifiers = ?")
+            params.append(block_identifiers)
+        if file_path is not None:
+            conditions.append("file_path = ?")
+            params.append(file_path)
+        if since is not None:
+            conditions.append("committed_at >= ?")
+            params.append(self.to_timestamp(since))
+        if until is not None:
+            conditions.append("committed_at <= ?")
+            params.append(self.to_timestamp(until))
+        if change_types:
+            conditions.append(f"change_type IN ({', '.join('?' for _ in change_types)})")
+            params.extend(change_types)
+        return " AND ".join(conditions), params
+
+    def get_block_history(self, project: str, block_identifiers: str, file_path: Optional[str] = None,
+                          since=None, until=None, change_types: Optional[List[str]] = None) -> List[dict]:
+        """
+        Retrieves every recorded change of a block, oldest first.
+
+        Args:
+            project (str): The name of the project.
+            block_identifiers (str): The block identifiers (e.g. "resource aws_s3_bucket logs").
+            file_path (Optional[str]): Restrict to a single file (default: all files).
+            since: Only changes committed at or after this date (datetime or epoch).
+            until: Only changes committed at or before this date (datetime or epoch).
+            change_types (Optional[List[str]]): Only these change types (e.g. ["modified"]).
+
+        Returns:
+            List[dict]: The changes, each with commit hash, date, file, block position and change type.
+        """
+        condition, params = self.build_block_filter(project, block_identifiers, file_path, since, until, change_types)
+        rows = self.connection.execute(
+            f"SELECT commit_hash, committed_at, file_path, block_identifiers, start_block, end_block, change_type "
+            f"FROM block_changes WHERE {condition} ORDER BY committed_at, id",
+            params
+        )
+        return [dict(row) for row in rows]
+
+    def count_block_changes(self, project: str, block_identifiers: str, file_path: Optional[str] = None,
+                            since=None, until=None, change_types: Optional[List[str]] = None) -> int:
+        """
+        Counts the commits that changed a block.
+
+        Args:
+            project (str): The name of the project.
+            block_identifiers (str): The block identifiers (e.g. "resource aws_s3_bucket logs").
+            file_path (Optional[str]): Restrict to a single file (default: all files).
+            since: Only changes committed at or after this date (datetime or epoch).
+            until: Only changes committed at or before this date (datetime or epoch).
+            change_types (Optional[List[str]]): Only these change types (e.g. ["modified"]).
+
+        Returns:
+            int: The number of distinct commits that changed the block.
+        """
+        condition, params = self.build_block_filter(project, block_identifiers, file_path, since, until, change_types)
+        row = self.connection.execute(
+            f"SELECT COUNT(DISTINCT commit_hash) FROM block_changes WHERE {condition}", params
+        ).fetchone()
+        return row[0]
+
+    def get_block_churn(self, project: str, file_path: Optional[str] = None, since=None, until=None,
+                        change_types: Optional[List[str]] = None, limit: Optional[int] = None) -> List[dict]:
+        """
+        Ranks blocks by the number of commits that changed them.
+
+        Args:
+            project (str): The name of the project.
+            file_path (Optional[str]): Restrict to a single file (default: all files).
+            since: Only changes committed at or after this date (datetime or epoch).
+            until: Only changes committed at or before this date (datetime or epoch).
+            change_types (Optional[List[str]]): Only these change types (e.g. ["modified"]).
+            limit (Optional[int]): Return at most this many blocks (default: all).
+
+        Returns:
+            List[dict]: One entry per (file, block) with its number of changing commits and last change date.
+        """
+        condition, params = self.build_block_filter(project, None, file_path, since, until, change_types)
+        query = (
+            f"SELECT file_path, block_identifiers, COUNT(DISTINCT commit_hash) AS num_changes, "
+            f"MAX(committed_at) AS last_changed_at FROM block_changes WHERE {condition} "
+            f"GROUP BY file_path, block_identifiers ORDER BY num_changes DESC, block_identifiers"
+        )
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self.connection.execute(query, params)]
@@ -0,0 +1,154 @@
+import codecs
+import subprocess
+import tempfile
+from typing import Iterator, List, Optional
+
+from utility.commit_filters import beSafeFromSpecialCommit, has_only_examples_tests_files_changed
+
+# Field and record separators of the `git log` output, unlikely to appear in commit messages
+FIELD_SEPARATOR = "\x1f"
+RECORD_SEPARATOR = "\x1e"
+LOG_FORMAT = f"{RECORD_SEPARATOR}%H{FIELD_SEPARATOR}%P{FIELD_SEPARATOR}%ct{FIELD_SEPARATOR}%aN{FIELD_SEPARATOR}%B"
+
+
+class CommitPreScanner:
+    """
+    Selects the commits worth a full analysis from a single streaming `git log` pass. Only the
+    commit metadata and the changed path names are read: no diff is computed, unlike
+    PyDriller's `commit.modified_files`.
+
+    Attributes:
+        local_repo_path (str): The path of the local repository.
+        chunk_size (int): The number of bytes read from `git log` at once.
+    """
+
+    def __init__(self, local_repo_path: str, chunk_size: int = 1 << 16):
+        """
+        Initializes the pre-scanner.
+
+        Args:
+            local_repo_path (str): The path of the local repository.
+            chunk_size (int): The number of bytes read from `git log` at once (default: 64 KiB).
+        """
+        self.local_repo_path = local_repo_path
+        self.chunk_size = chunk_size
+
+    def build_command(self, revision_range: Optional[str], since: Optional[str], until: Optional[str]) -> List[str]:
+        command = ["git", "-C", self.local_repo_path, "log", "-z", "--name-only", "--reverse",
+                   f"--format={LOG_FORMAT}"]
+        if since is not None:
+            command.append(f"--since={since}")
+        if until is not None:
+            command.append(f"--until={until}")
+        command.append(revision_range or "HEAD")
+        return command
+
+    @staticmethod
+    def parse_record(record: str) -> dict:
+        commit_hash, parents, committed_at, author, rest = record.split(FIELD_SEPARATOR, 4)
+        # With -z, the message is NUL-terminated and followed by the NUL-terminated path names
+        message, *paths = rest.split("\0")
+        return {
+            "hash": commit_hash,
+            "parents": parents.split(),
+            "committed_at": int(committed_at),
+            "author": author,
+            "message": message,
+            "paths": [path.lstrip("\n") for path in paths if path.strip("\n")]
+        }
+
+    def iter_commit_metadata(self, revision_range: Optional[str] = None, since: Optional[str] = None,
+                             until: Optional[str] = None) -> Iterator[dict]:
+        """
+        Streams the metadata and changed paths of the commits, oldest first.
+
+        Args:
+            revision_range (Optional[str]): A git revision range (default: "HEAD").
+            since (Optional[str]): Only commits more recent than this date (any `git log --since` value).
+            until (Optional[str]): Only commits older than this date (any `git log --until` value).
+
+        Returns:
+            Iterator[dict]: One dict per commit with its hash, parents, commit timestamp, author,
+                            message and changed paths.
+        """
+        # stderr goes to a file: a pipe read only after stdout would block git once filled with warnings
+        stderr_file = tempfile.TemporaryFile()
+        process = subprocess.Popen(
+            self.build_command(revision_range, since, until), stdout=subprocess.PIPE, stderr=stderr_file
+        )
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        buffer = ""
+        completed = False
+        try:
+            while True:
+                chunk = process.stdout.read(self.chunk_size)
+                buffer += decoder.decode(chunk, final=not chunk)
+                *records, buffer = buffer.split(RECORD_SEPARATOR)
+                for record in records:
+                    if record:
+                        yield self.parse_record(record)
+                if not chunk:
+                    break
+            if buffer:
+                yield self.parse_record(buffer)
+            completed = True
+        finally:
+            if not completed:
+                # The consumer stopped early: there is no need to read the rest of the history
+                process.kill()
+            process.stdout.close()
+            return_code = process.wait()
+            stderr_file.seek(0)
+            stderr = stderr_file.read()
+            stderr_file.close()
+            if return_code != 0 and completed:
+                raise RuntimeError(f"git log failed in {self.local_repo_path}: {stderr.decode(errors='replace')}")
+
+    @staticmethod
+    def is_worth_analysis(commit: dict, filter_messages: bool = True) -> bool:
+        """
+        Applies the commit filters of `utility.commit_filters` to pre-scanned metadata.
+
+        Args:
+            commit (dict): The metadata of a commit, as yielded by `iter_commit_metadata`.
+            filter_messages (bool): Also discard merge/revert commits by message (default: True).
+
+        Returns:
+            bool: True if the commit should be analyzed, False otherwise.
+        """
+        # Merge commits have no modified files in PyDriller
+        if len(commit["parents"]) > 1:
+            return False
+        if has_only_examples_tests_files_changed(commit["paths"]):
+            return False
+        if filter_messages and not beSafeFromSpecialCommit(commit["message"].lower()):
+            return False
+        return True
+
+    def select_commits(self, revision_range: Optional[str] = None, since: Optional[str] = None,
+                       until: Optional[str] = None, filter_messages: bool = True) -> Iterator[dict]:
+        """
+        Streams the metadata of the commits worth a full analysis, oldest first.
+
+        Args:
+            revision_range (Optional[str]): A git revision range (default: "HEAD").
+            since (Optional[str]): Only commits more recent than this date.
+            until (Optional[str]): Only commits older than this date.
+            filter_messages (bool): Also discard merge/revert commits by message (default: True).
+
+        Returns:
+            Iterator[dict]: The metadata of the selected commits.
+        """
+        for commit in self.iter_commit_metadata(revision_range, since, until):
+            if self.is_worth_analysis(commit, filter_messages):
+                yield commit
+
+    def select_commit_hashes(self, revision_range: Optional[str] = None, since: Optional[str] = None,
+                             until: Optional[str] = None, filter_messages: bool = True) -> List[str]:
+        """
+        Lists the hashes of the commits worth a full analysis, oldest first.
+
+        Returns:
+            List[str]: The hashes of the selected commits.
+        """
+        return [commit["hash"] for commit in self.select_commits(revision_range, since, until, filter_messages)]
@@ -0,0 +1,305 @@
+import bisect
+import functools
+import math
+import random
+import time
+from collections import Counter, defaultdict
+from itertools import islice
+from statistics import NormalDist
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from core.ProjectAnalyzer import ProjectAnalyzer
+from core.mining.CommitPreScanner import CommitPreScanner
+from core.mining.ParallelCommitMiner import ParallelCommitMiner
+from utility.block_features import extract_block_features, filter_reported_blocks
+
+
+def count_reported_blocks(changed_blocks: List[dict]) -> float:
+    return float(sum(len(filter_reported_blocks(changed_file["itsChangedBlocks"])) for changed_file in changed_blocks))
+
+
+def count_changed_tf_files(changed_blocks: List[dict]) -> float:
+    return float(len(changed_blocks))
+
+
+def touches_blocks(changed_blocks: List[dict]) -> float:
+    return 1.0 if count_reported_blocks(changed_blocks) else 0.0
+
+
+class DefectiveBlockCount:
+    """
+    A metric counting the blocks of a commit predicted as defective by a fitted model. With worker
+    processes, the model is sent along with every commit: keep it small.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, changed_blocks: List[dict]) -> float:
+        X, _ = extract_block_features(changed_blocks)
+        if not X:
+            return 0.0
+        return float(sum(int(prediction) == 1 for prediction in self.model.predict(X)))
+
+
+DEFAULT_METRICS = {
+    "changed_blocks": count_reported_blocks,
+    "changed_tf_files": count_changed_tf_files,
+    "touches_blocks": touches_blocks
+}
+
+
+def compute_metrics(metrics: Dict[str, Callable[[List[dict]], float]], changed_blocks: List[dict]) -> Dict[str, float]:
+    return {name: metric(changed_blocks) for name, metric in metrics.items()}
+
+
+class CommitSampler:
+    """
+    Estimates per-commit statistics of a repository from a stratified random sample of its commits,
+    instead of analyzing the whole history. Commits are pre-scanned without their diffs and grouped
+    into strata by time window, author and number of touched TF files; the sample is drawn so that
+    every prefix of it is spread over the strata in proportion to their size. The estimates are
+    therefore refined progressively, until the commit or time budget is spent.
+
+    Attributes:
+        projectAnalyzer (ProjectAnalyzer): The analyzer of the repository.
+        metrics (Dict[str, Callable]): The per-commit metrics, computed from the changed blocks of a commit.
+        time_windows (int): The number of equal time windows of the history.
+        top_authors (int): The number of most active authors with their own strata; the others share one.
+        file_count_edges (Sequence[int]): The lower bounds of the touched TF file count buckets.
+        report_every (int): The number of analyzed commits between two estimates.
+        workers (int): The number of worker processes analyzing the sampled commits.
+        confidence (float): The confidence level of the intervals.
+        seed (Optional[int]): The seed of the random sample.
+    """
+
+    def __init__(
+            self,
+            projectAnalyzer: ProjectAnalyzer,
+            metrics: Optional[Dict[str, Callable[[List[dict]], float]]] = None,
+            time_windows: int = 8,
+            top_authors: int = 5,
+            file_count_edges: Sequence[int] = (1, 2, 4, 8),
+            report_every: int = 50,
+            workers: int = 1,
+            confidence: float = 0.95,
+            seed: Optional[int] = 0
+    ):
+        """
+        Initializes the sampler.
+
+        Args:
+            projectAnalyzer (ProjectAnalyzer): The analyzer of the repository.
+            metrics (Optional[Dict[str, Callable]]): Picklable functions computing a number from the changed
+                                                     blocks of a commit (default: `DEFAULT_METRICS`).
+            time_windows (int): The number of equal time windows of the history (default: 8).
+            top_authors (int): The number of authors with their own strata (default: 5).
+            file_count_edges (Sequence[int]): The lower bounds of the touched TF file count buckets
+                                              (default: 1, 2-3, 4-7 and 8+ files).
+            report_every (int): The number of analyzed commits between two estimates (default: 50).
+            workers (int): The number of worker processes (default: 1, no pool).
+            confidence (float): The confidence level of the intervals (default: 0.95).
+            seed (Optional[int]): The seed of the random sample (default: 0).
+        """
+        self.projectAnalyzer = projectAnalyzer
+        self.metrics = metrics or DEFAULT_METRICS
+        self.time_windows = time_windows
+        self.top_authors = top_authors
+        self.file_count_edges = sorted(file_count_edges)
+        self.report_every = report_every
+        self.workers = workers
+        self.confidence = confidence
+        self.seed = seed
+
+    def build_strata(self, revision_range: Optional[str] = None, since: Optional[str] = None,
+                     until: Optional[str] = None) -> Dict[Tuple, List[str]]:
+        """
+        Pre-scans the commits worth analysis and groups them into strata.
+
+        Returns:
+            Dict[Tuple, List[str]]: The commit hashes of each (time window, author, file count bucket) stratum.
+        """
+        commits = []
+        for commit in CommitPreScanner(self.projectAnalyzer.local_repo_path).select_commits(revision_range, since,
+                                                                                            until):
+            num_files = sum(1 for path in commit["paths"] if self.projectAnalyzer.is_file_to_parse(path))
+            commits.append((commit["hash"], commit["committed_at"], commit["author"], num_files))
+        if not commits:
+            return {}
+
+        first = min(committed_at for _, committed_at, _, _ in commits)
+        span = max(max(committed_at for _, committed_at, _, _ in commits) - first, 1)
+        authors = {author for author, _ in Counter(author for _, _, author, _ in commits).most_common(self.top_authors)}
+
+        strata = defaultdict(list)
+        for commit_hash, committed_at, author, num_files in commits:
+            window = min(int((committed_at - first) / span * self.time_windows), self.time_windows - 1)
+            file_bucket = bisect.bisect_right(self.file_count_edges, num_files)
+            strata[(window, author if author in authors else None, file_bucket)].append(commit_hash)
+        return dict(strata)
+
+    def iter_sample(self, strata: Dict[Tuple, List[str]]) -> Iterator[Tuple[Tuple, str]]:
+        """
+        Draws commits without replacement, so that every prefix of the sample covers the strata in
+        proportion to their size. Each stratum gets one commit first, largest strata first.
+
+        Returns:
+            Iterator[Tuple[Tuple, str]]: (stratum, commit hash) pairs.
+        """
+        rng = random.Random(self.seed)
+        remaining = {}
+        for stratum, commit_hashes in strata.items():
+            remaining[stratum] = commit_hashes[:]
+            rng.shuffle(remaining[stratum])
+
+        population = sum(len(commit_hashes) for commit_hashes in strata.values())
+        drawn = dict.fromkeys(strata, 0)
+        for stratum in sorted(strata, key=lambda s: len(strata[s]), reverse=True):
+            drawn[stratum] = 1
+            yield stratum, remaining[stratum].pop()
+
+        num_drawn = len(strata)
+        while num_drawn < population:
+            num_drawn += 1
+            # The stratum furthest below its proportional share of the sample
+            stratum = max((s for s in strata if remaining[s]),
+                          key=lambda s: len(strata[s]) * num_drawn / population - drawn[s])
+            drawn[stratum] += 1
+            yield stratum, remaining[stratum].pop()
+
+    def estimate(self, strata: Dict[Tuple, List[str]], observations: Dict[Tuple, List[Dict[str, float]]],
+                 elapsed: float) -> dict:
+        """
+        Computes the stratified estimates of the metrics from the observations so far.
+
+        Args:
+            strata (Dict[Tuple, List[str]]): The strata of the population.
+            observations (Dict[Tuple, List[Dict[str, float]]]): The metrics of the analyzed commits of each stratum.
+            elapsed (float): The time spent so far, in seconds.
+
+        Returns:
+            dict: The sample and population sizes, and for each metric its per-commit mean and its total
+                  over the covered commits, with their confidence intervals. Until every stratum has a
+                  sampled commit, the estimates only describe the commits of the sampled strata:
+                  "covers_population" is then False, for the estimate and for each metric.
+        """
+        population = sum(len(commit_hashes) for commit_hashes in strata.values())
+        sampled = {stratum: values for stratum, values in observations.items() if values}
+        covered = sum(len(strata[stratum]) for stratum in sampled)
+        num_sampled = sum(len(values) for values in sampled.values())
+        covers_population = covered == population
+        z = NormalDist().inv_cdf((1 + self.confidence) / 2)
+
+        metrics = {}
+        for name in self.metrics:
+            all_values = [value[name] for values in sampled.values() for value in values]
+            # Strata with a single observation borrow the variance of the whole sample
+            pooled_variance = self.variance(all_values)
+
+            mean, variance = 0.0, 0.0
+            for stratum, values in sampled.items():
+                stratum_values = [value[name] for value in values]
+                weight = len(strata[stratum]) / covered
+                stratum_mean = sum(stratum_values) / len(stratum_values)
+                stratum_variance = self.variance(stratum_values) if len(stratum_values) > 1 else pooled_variance
+                finite_population_correction = 1 - len(stratum_values) / len(strata[stratum])
+                mean += weight * stratum_mean
+                variance += weight ** 2 * finite_population_correction * stratum_variance / len(stratum_values)
+
+            margin = z * math.sqrt(variance) if num_sampled else float("nan")
+            metrics[name] = {
+                "mean": mean if num_sampled else float("nan"),
+                "ci_low": mean - margin,
+                "ci_high": mean + margin,
+                "total": mean * covered,
+                "total_ci_low": (mean - margin) * covered,
+                "total_ci_high": (mean + margin) * covered,
+                "covers_population": covers_population
+            }
+
+        return {
+            "sampled_commits": num_sampled,
+            "population_commits": population,
+            "covered_commits": covered,
+            "strata": len(strata),
+            "sampled_strata": len(sampled),
+            "covers_population": covers_population,
+            "elapsed": elapsed,
+            "complete": num_sampled == population,
+            "metrics": metrics
+        }
+
+    @staticmethod
+    def variance(values: List[float]) -> float:
+        if len(values) < 2:
+            return 0.0
+        mean = sum(values) / len(values)
+        return sum((value - mean) ** 2 for value in values) / (len(values) - 1)
+
+    def iter_estimates(self, max_commits: Optional[int] = None, max_seconds: Optional[float] = None,
+                       revision_range: Optional[str] = None, since: Optional[str] = None,
+                       until: Optional[str] = None) -> Iterator[dict]:
+        """
+        Analyzes sampled commits until the budget is spent or every commit is analyzed, and yields an
+        estimate every `report_every` commits and at the end.
+
+        Args:
+            max_commits (Optional[int]): The maximum number of commits to analyze (default: no limit).
+            max_seconds (Optional[float]): The time budget, pre-scan included (default: no limit). The commits
+                                           in flight when it expires are still analyzed, but not used.
+            revision_range (Optional[str]): A git revision range (default: "HEAD").
+            since (Optional[str]): Only commits more recent than this date.
+            until (Optional[str]): Only commits older than this date.
+
+        Returns:
+            Iterator[dict]: The successive estimates, see `estimate`.
+        """
+        start = time.monotonic()
+        strata = self.build_strata(revision_range, since, until)
+        population = sum(len(commit_hashes) for commit_hashes in strata.values())
+        print(f"🎯 Sampling {population} commits in {len(strata)} strata")
+
+        sample = self.iter_sample(strata)
+        if max_commits is not None:
+            sample = islice(sample, max_commits)
+        stratum_of = {}
+
+        def sampled_hashes():
+            for stratum, commit_hash in sample:
+                stratum_of[commit_hash] = stratum
+                yield commit_hash
+
+        observations = defaultdict(list)
+        estimate = None
+        num_analyzed = 0
+        num_reported = None
+        # The metrics are computed from the TF files only: the other files are neither measured nor counted
+        miner = ParallelCommitMiner(self.projectAnalyzer, self.workers, only_files_to_parse=True)
+        transform = functools.partial(compute_metrics, self.metrics)
+        if max_seconds is None or time.monotonic() - start < max_seconds:
+            for commit_hash, values in miner.mine(sampled_hashes(), transform):
+                observations[stratum_of.pop(commit_hash)].append(values)
+                num_analyzed += 1
+                if max_seconds is not None and time.monotonic() - start >= max_seconds:
+                    break
+                if num_analyzed % self.report_every == 0:
+                    num_reported = num_analyzed
+                    estimate = self.estimate(strata, observations, time.monotonic() - start)
+                    yield estimate
+
+        if num_reported != num_analyzed:
+            estimate = self.estimate(strata, observations, time.monotonic() - start)
+            yield estimate
+        if estimate is not None and not estimate["covers_population"]:
+            print(f"⚠️ Only {estimate['sampled_strata']} of {estimate['strata']} strata were sampled: the "
+                  f"estimates describe {estimate['covered_commits']} of {population} commits")
+
+    def sample(self, max_commits: Optional[int] = None, max_seconds: Optional[float] = None, **kwargs) -> dict:
+        """
+        Returns:
+            dict: The final estimate of `iter_estimates`.
+        """
+        estimate = None
+        for estimate in self.iter_estimates(max_commits, max_seconds, **kwargs):
+            pass
+        return estimate
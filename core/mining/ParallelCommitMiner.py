@@ -0,0 +1,144 @@
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+from core.ProjectAnalyzer import ProjectAnalyzer
+from core.cache.ResultCache import ResultCache
+
+# The analyzer of the current worker process, created once by `init_worker`
+worker_analyzer: Optional[ProjectAnalyzer] = None
+
+
+def init_worker(projectName: str, repo_url: str, local_repo_path: str, file_ext_to_parse, terrametrics_limits,
+                result_cache_settings: Optional[dict], stdout_to_stderr: bool):
+    global worker_analyzer
+    if stdout_to_stderr:
+        sys.stdout = sys.stderr
+    # Each worker measures its files in its own directory, removed when the worker exits
+    work_dir = tempfile.mkdtemp(prefix="terrametrics_")
+    Finalize(None, shutil.rmtree, args=(work_dir,), kwargs={"ignore_errors": True}, exitpriority=10)
+    # A SQLite connection must not be used across fork(): each worker opens the cache again
+    result_cache = ResultCache(**result_cache_settings) if result_cache_settings is not None else None
+    worker_analyzer = ProjectAnalyzer(
+        projectName, repo_url, local_repo_path, file_ext_to_parse=file_ext_to_parse, work_dir=work_dir,
+        terrametrics_limits=terrametrics_limits, result_cache=result_cache
+    )
+
+
+def run_analysis(analyzer: ProjectAnalyzer, commit_hash: str, transform: Optional[Callable] = None,
+                 report_errors: bool = False, only_files_to_parse: bool = True) -> Tuple[str, object, Optional[str]]:
+    if not report_errors:
+        changed_blocks = analyzer.identify_changed_block_from_specific_commits(commit_hash, only_files_to_parse)
+        return commit_hash, (transform(changed_blocks) if transform is not None else changed_blocks), None
+
+    # Errors are returned instead of raised, so that one commit does not stop the others
+    try:
+        if analyzer.resolve_commit_hash(commit_hash) is None:
+            return commit_hash, None, f"Commit {commit_hash} not found"
+        changed_blocks = analyzer.identify_changed_block_from_specific_commits(commit_hash, only_files_to_parse)
+        return commit_hash, (transform(changed_blocks) if transform is not None else changed_blocks), None
+    except Exception as e:
+        return commit_hash, None, f"{type(e).__name__}: {e}"
+
+
+def analyze_commit(commit_hash: str, transform: Optional[Callable] = None, report_errors: bool = False,
+                   only_files_to_parse: bool = True):
+    return run_analysis(worker_analyzer, commit_hash, transform, report_errors, only_files_to_parse)
+
+
+class ParallelCommitMiner:
+    """
+    Analyzes many commits of a repository in a pool of worker processes, each holding its own
+    ProjectAnalyzer. At most `max_pending` commits are in flight, so memory stays bounded
+    whatever the length of the commit stream.
+
+    Attributes:
+        projectAnalyzer (ProjectAnalyzer): The analyzer whose configuration is replicated in the workers.
+        workers (int): The number of worker processes (1 analyzes in the current process).
+        max_pending (int): The maximum number of submitted but not yet consumed commits.
+        stdout_to_stderr (bool): Whether the workers print their progress to stderr instead of stdout.
+        only_files_to_parse (bool): Whether files whose extension is not in `file_ext_to_parse` are skipped.
+    """
+
+    def __init__(
+            self,
+            projectAnalyzer: ProjectAnalyzer,
+            workers: int = 1,
+            max_pending: Optional[int] = None,
+            stdout_to_stderr: bool = False,
+            only_files_to_parse: bool = True
+    ):
+        """
+        Initializes the miner.
+
+        Args:
+            projectAnalyzer (ProjectAnalyzer): The analyzer of the repository to mine.
+            workers (int): The number of worker processes (default: 1, no pool).
+            max_pending (Optional[int]): The maximum number of commits in flight (default: 4 per worker).
+            stdout_to_stderr (bool): Print the workers' progress to stderr, keeping stdout for results (default: False).
+            only_files_to_parse (bool): Skip the files that are not TF files, without measuring them (default: True).
+        """
+        self.projectAnalyzer = projectAnalyzer
+        self.workers = max(1, workers)
+        self.max_pending = max_pending or 4 * self.workers
+        self.stdout_to_stderr = stdout_to_stderr
+        self.only_files_to_parse = only_files_to_parse
+
+    def mine(self, commit_hashes: Iterable[str], transform: Optional[Callable] = None,
+             on_error: Optional[Callable[[str, str], None]] = None) -> Iterator[Tuple[str, object]]:
+        """
+        Analyzes commits and yields their changed blocks in input order.
+
+        Args:
+            commit_hashes (Iterable[str]): The hashes of the commits to analyze; consumed lazily.
+            transform (Optional[Callable]): A picklable function applied to the changed blocks inside
+                                            the worker (e.g. feature extraction) before they are sent back.
+            on_error (Optional[Callable[[str, str], None]]): Called with the commit hash and the error message
+                                                             of each commit that does not exist or whose analysis
+                                                             fails; such commits are not yielded. Without it,
+                                                             the first failure is raised.
+
+        Returns:
+            Iterator[Tuple[str, object]]: (commit hash, changed blocks or their transform) pairs.
+        """
+        report_errors = on_error is not None
+        if self.workers == 1:
+            for commit_hash in commit_hashes:
+                output = contextlib.redirect_stdout(sys.stderr) if self.stdout_to_stderr else contextlib.nullcontext()
+                with output:
+                    result = run_analysis(self.projectAnalyzer, commit_hash, transform, report_errors,
+                                          self.only_files_to_parse)
+                yield from self.handle_result(result, on_error)
+            return
+
+        analyzer = self.projectAnalyzer
+        result_cache_settings = analyzer.result_cache.get_settings() if analyzer.result_cache is not None else None
+        with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=init_worker,
+                initargs=(analyzer.projectName, analyzer.repo_url, os.path.dirname(analyzer.local_repo_path),
+                          analyzer.file_ext_to_parse, analyzer.terrametrics_limits, result_cache_settings,
+                          self.stdout_to_stderr)
+        ) as executor:
+            pending = deque()
+            for commit_hash in commit_hashes:
+                pending.append(executor.submit(analyze_commit, commit_hash, transform, report_errors,
+                                               self.only_files_to_parse))
+                if len(pending) >= self.max_pending:
+                    yield from self.handle_result(pending.popleft().result(), on_error)
+            while pending:
+                yield from self.handle_result(pending.popleft().result(), on_error)
+
+    @staticmethod
+    def handle_result(result: Tuple[str, object, Optional[str]], on_error: Optional[Callable[[str, str], None]]):
+        commit_hash, output, error = result
+        if error is not None:
+            on_error(commit_hash, error)
+        else:
+            yield commit_hash, output
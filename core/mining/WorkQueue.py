@@ -0,0 +1,380 @@
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import tempfile
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core.ProjectAnalyzer import ProjectAnalyzer, has_failed_measurement
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class WorkQueue:
+    """
+    A durable queue of (project, commit) work items stored in SQLite. Workers lease items for a
+    limited time; an item whose lease expires (e.g. its worker crashed) is handed out again, and a
+    failed item is retried with exponential backoff up to `max_attempts` times. Results are stored
+    with the items, so a restarted mining run resumes where it stopped.
+
+    Several processes, on one host or on hosts sharing the database file, can pull from the same
+    queue. Sharing over a network filesystem requires one with working POSIX locks.
+
+    Attributes:
+        db_path (str): The path of the SQLite database file.
+        max_attempts (int): The number of attempts before an item is marked as failed.
+        backoff_seconds (float): The delay before the first retry, doubled at each attempt.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS work_items (
+            project TEXT NOT NULL,
+            commit_hash TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            available_at REAL NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_expires_at REAL,
+            result TEXT,
+            error TEXT,
+            updated_at REAL,
+            PRIMARY KEY (project, commit_hash)
+        );
+        CREATE INDEX IF NOT EXISTS idx_work_items_status ON work_items (status, available_at);
+    """
+
+    def __init__(self, db_path: str, max_attempts: int = 3, backoff_seconds: float = 30.0):
+        """
+        Opens (and creates if needed) the queue database.
+
+        Args:
+            db_path (str): The path of the SQLite database file.
+            max_attempts (int): The number of attempts before an item is marked as failed (default: 3).
+            backoff_seconds (float): The delay before the first retry, doubled at each attempt (default: 30).
+        """
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Transactions are managed explicitly, see `transaction`
+        self.connection = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(self.SCHEMA)
+
+    def close(self):
+        """
+        Closes the connection to the database.
+        """
+        self.connection.close()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE takes the write lock upfront, so two workers never lease the same item
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def enqueue(self, project: str, commit_hashes: Iterable[str]) -> int:
+        """
+        Adds commits to the queue. Commits already queued (whatever their status) are left untouched.
+
+        Args:
+            project (str): The project name.
+            commit_hashes (Iterable[str]): The hashes of the commits to analyze.
+
+        Returns:
+            int: The number of newly queued commits.
+        """
+        now = time.time()
+        with self.transaction() as connection:
+            before = connection.total_changes
+            connection.executemany(
+                "INSERT OR IGNORE INTO work_items (project, commit_hash, updated_at) VALUES (?, ?, ?)",
+                ((project, commit_hash, now) for commit_hash in commit_hashes)
+            )
+            return connection.total_changes - before
+
+    def lease(self, owner: str, limit: int = 1, lease_seconds: float = 600.0) -> List[Tuple[str, str]]:
+        """
+        Leases available items: pending items whose backoff has elapsed and leased items whose lease expired.
+
+        Args:
+            owner (str): The identifier of the worker taking the lease.
+            limit (int): The maximum number of items to lease (default: 1).
+            lease_seconds (float): The duration of the lease (default: 600).
+
+        Returns:
+            List[Tuple[str, str]]: The leased (project, commit hash) pairs.
+        """
+        now = time.time()
+        with self.transaction() as connection:
+            # An item whose lease expired on its last allowed attempt has failed
+            connection.execute(
+                "UPDATE work_items SET status = ?, error = COALESCE(error, 'lease expired'), lease_owner = NULL, "
+                "updated_at = ? WHERE status = ? AND lease_expires_at <= ? AND attempts >= ?",
+                (FAILED, now, LEASED, now, self.max_attempts)
+            )
+            rows = connection.execute(
+                "SELECT project, commit_hash FROM work_items "
+                "WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at <= ?) "
+                "ORDER BY rowid LIMIT ?",
+                (PENDING, now, LEASED, now, limit)
+            ).fetchall()
+            connection.executemany(
+                "UPDATE work_items SET status = ?, attempts = attempts + 1, lease_owner = ?, lease_expires_at = ?, "
+                "updated_at = ? WHERE project = ? AND commit_hash = ?",
+                ((LEASED, owner, now + lease_seconds, now, row["project"], row["commit_hash"]) for row in rows)
+            )
+        return [(row["project"], row["commit_hash"]) for row in rows]
+
+    def extend_lease(self, owner: str, project: str, commit_hash: str, lease_seconds: float = 600.0) -> bool:
+        """
+        Extends the lease of an item still held by the worker.
+
+        Returns:
+            bool: True if the lease was extended, False if the worker no longer holds it.
+        """
+        with self.transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE work_items SET lease_expires_at = ? WHERE project = ? AND commit_hash = ? "
+                "AND status = ? AND lease_owner = ?",
+                (time.time() + lease_seconds, project, commit_hash, LEASED, owner)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, owner: str, project: str, commit_hash: str, result) -> bool:
+        """
+        Stores the result of an item and marks it as done. The analysis of a commit is deterministic,
+        so the result of a worker whose lease expired is accepted too; completing an item twice is
+        harmless: the first stored result is kept.
+
+        Args:
+            owner (str): The identifier of the worker that analyzed the item.
+            project (str): The project name.
+            commit_hash (str): The hash of the commit.
+            result: The JSON-serializable result of the analysis.
+
+        Returns:
+            bool: True if this call stored the result, False if the item was already done or is unknown.
+        """
+        with self.transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE work_items SET status = ?, result = ?, error = NULL, lease_owner = ?, "
+                "lease_expires_at = NULL, updated_at = ? WHERE project = ? AND commit_hash = ? AND status != ?",
+                (DONE, json.dumps(result), owner, time.time(), project, commit_hash, DONE)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, owner: str, project: str, commit_hash: str, error: str):
+        """
+        Records a failed attempt: the item is retried after a backoff, or marked as failed
+        once it has used all its attempts.
+
+        Args:
+            owner (str): The identifier of the worker holding the lease.
+            project (str): The project name.
+            commit_hash (str): The hash of the commit.
+            error (str): A description of the failure.
+        """
+        now = time.time()
+        with self.transaction() as connection:
+            row = connection.execute(
+                "SELECT attempts FROM work_items WHERE project = ? AND commit_hash = ? AND status = ? "
+                "AND lease_owner = ?",
+                (project, commit_hash, LEASED, owner)
+            ).fetchone()
+            if row is None:
+                return
+            attempts = row["attempts"]
+            status = FAILED if attempts >= self.max_attempts else PENDING
+            connection.execute(
+                "UPDATE work_items SET status = ?, error = ?, available_at = ?, lease_owner = NULL, "
+                "lease_expires_at = NULL, updated_at = ? WHERE project = ? AND commit_hash = ?",
+                (status, error, now + self.backoff_seconds * 2 ** (attempts - 1), now, project, commit_hash)
+            )
+
+    def retry_failed(self, project: Optional[str] = None) -> int:
+        """
+        Puts failed items back in the queue with a fresh attempt budget.
+
+        Returns:
+            int: The number of items queued again.
+        """
+        condition, params = ("status = ?", [FAILED]) if project is None else ("status = ? AND project = ?",
+                                                                              [FAILED, project])
+        with self.transaction() as connection:
+            cursor = connection.execute(
+                f"UPDATE work_items SET status = ?, attempts = 0, available_at = 0 WHERE {condition}", [PENDING] + params
+            )
+            return cursor.rowcount
+
+    def counts(self, project: Optional[str] = None) -> Dict[str, int]:
+        """
+        Counts the items by status.
+
+        Returns:
+            Dict[str, int]: The number of items of each status.
+        """
+        query = "SELECT status, COUNT(*) AS n FROM work_items"
+        params = []
+        if project is not None:
+            query += " WHERE project = ?"
+            params.append(project)
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        for row in self.connection.execute(query + " GROUP BY status", params):
+            counts[row["status"]] = row["n"]
+        return counts
+
+    def iter_results(self, project: Optional[str] = None) -> Iterator[Tuple[str, str, object]]:
+        """
+        Iterates over the stored results, in queue order.
+
+        Returns:
+            Iterator[Tuple[str, str, object]]: (project, commit hash, result) triples.
+        """
+        query = "SELECT project, commit_hash, result FROM work_items WHERE status = ?"
+        params = [DONE]
+        if project is not None:
+            query += " AND project = ?"
+            params.append(project)
+        for row in self.connection.execute(query + " ORDER BY rowid", params).fetchall():
+            yield row["project"], row["commit_hash"], json.loads(row["result"])
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_worker(
+        queue: WorkQueue,
+        analyzer_factory: Callable[[str], ProjectAnalyzer],
+        owner: Optional[str] = None,
+        batch_size: int = 1,
+        lease_seconds: float = 600.0,
+        wait_when_idle: bool = False,
+        poll_seconds: float = 5.0
+) -> int:
+    """
+    Leases items from the queue, analyzes their commits and stores the changed blocks as results.
+    Missing commits and analyses with a TerraMetrics measurement that did not complete are failed,
+    and retried until the attempts of the queue are spent.
+
+    Args:
+        queue (WorkQueue): The queue to pull from.
+        analyzer_factory (Callable[[str], ProjectAnalyzer]): Builds the analyzer of a project.
+        owner (Optional[str]): The identifier of the worker (default: host name and process id).
+        batch_size (int): The number of items leased at once (default: 1).
+        lease_seconds (float): The duration of each lease (default: 600).
+        wait_when_idle (bool): Keep polling when the queue is empty instead of returning (default: False).
+        poll_seconds (float): The delay between polls of an empty queue (default: 5).
+
+    Returns:
+        int: The number of items completed by this worker.
+    """
+    owner = owner or default_worker_id()
+    analyzers: Dict[str, ProjectAnalyzer] = {}
+    completed = 0
+
+    while True:
+        items = queue.lease(owner, batch_size, lease_seconds)
+        if not items:
+            counts = queue.counts()
+            if not wait_when_idle and counts[PENDING] == 0 and counts[LEASED] == 0:
+                return completed
+            time.sleep(poll_seconds)
+            continue
+
+        while items:
+            # Renew the leases of the items still waiting in the batch before each analysis, and leave
+            # the items whose lease expired anyway to the worker that took them over
+            held = [item for item in items if queue.extend_lease(owner, *item, lease_seconds=lease_seconds)]
+            for project, commit_hash in items:
+                if (project, commit_hash) not in held:
+                    print(f"⚠️ Lease of {project}@{commit_hash} lost, skipping it")
+            if not held:
+                break
+            (project, commit_hash), items = held[0], held[1:]
+
+            try:
+                if project not in analyzers:
+                    analyzers[project] = analyzer_factory(project)
+                if analyzers[project].resolve_commit_hash(commit_hash) is None:
+                    raise ValueError(f"Commit {commit_hash} not found")
+                changed_blocks = analyzers[project].identify_changed_block_from_specific_commits(
+                    commit_hash, only_files_to_parse=True)
+                if has_failed_measurement(changed_blocks):
+                    raise RuntimeError("A TerraMetrics measurement did not complete")
+            except Exception as e:
+                print(f"❌ Error analyzing {project}@{commit_hash}: {e}")
+                queue.fail(owner, project, commit_hash, str(e))
+                continue
+
+            if queue.complete(owner, project, commit_hash, changed_blocks):
+                completed += 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Durable work queue for mining commits.")
+    parser.add_argument("--db", required=True, help="Path of the queue database")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="Queue commits of a project")
+    enqueue_parser.add_argument("--project", required=True)
+    enqueue_parser.add_argument("--local-path", default="clones")
+    enqueue_parser.add_argument("--prescan", action="store_true", help="Queue only the commits worth analysis")
+    enqueue_parser.add_argument("revisions", nargs="+", help="Commit hashes or revision ranges")
+
+    work_parser = subparsers.add_parser("work", help="Analyze queued commits")
+    work_parser.add_argument("--local-path", default="clones")
+    work_parser.add_argument("--batch-size", type=int, default=1)
+    work_parser.add_argument("--lease-seconds", type=float, default=600.0)
+    work_parser.add_argument("--wait", action="store_true", help="Keep polling when the queue is empty")
+
+    subparsers.add_parser("status", help="Count the items by status")
+    subparsers.add_parser("retry-failed", help="Queue failed items again")
+
+    args = parser.parse_args()
+    workQueue = WorkQueue(args.db)
+
+    if args.action == "enqueue":
+        analyzer = ProjectAnalyzer(args.project, f"https://github.com/{args.project}.git", args.local_path)
+        hashes = []
+        for revision in args.revisions:
+            if ".." in revision:
+                hashes.extend(analyzer.prescan_commits(revision) if args.prescan
+                              else analyzer.expand_commit_range(revision))
+            else:
+                hashes.append(revision)
+        print(f"📥 Queued {workQueue.enqueue(args.project, hashes)} new commits")
+    elif args.action == "work":
+        # Workers running on the same host must not share the TerraMetrics temporary files
+        work_dir = tempfile.mkdtemp(prefix="terrametrics_")
+
+        def build_analyzer(project):
+            return ProjectAnalyzer(project, f"https://github.com/{project}.git", args.local_path, work_dir=work_dir)
+
+        try:
+            done = run_worker(workQueue, build_analyzer, batch_size=args.batch_size,
+                              lease_seconds=args.lease_seconds, wait_when_idle=args.wait)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        print(f"✅ Completed {done} commits")
+    elif args.action == "status":
+        print(json.dumps(workQueue.counts()))
+    elif args.action == "retry-failed":
+        print(f"🔁 Queued {workQueue.retry_failed()} failed commits again")
@@ -0,0 +1,355 @@
+import argparse
+import json
+import queue
+import threading
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.ProjectAnalyzer import ProjectAnalyzer
+from core.cache.ResultCache import ResultCache
+from utility.block_features import extract_block_features, group_predictions_by_file
+
+
+class DefectPredictor:
+    """
+    Scores the changed blocks of commits with a serialized model. The model and one
+    ProjectAnalyzer per project are loaded once and reused for every request.
+
+    Attributes:
+        model: A fitted estimator exposing `predict`.
+        local_repo_path (str): The directory where the repositories are stored/cloned.
+        clone_repo (bool): Whether missing repositories should be cloned.
+        analyzers (Dict[str, ProjectAnalyzer]): The warm analyzers, keyed by project name.
+        result_cache (Optional[ResultCache]): The cache of the changed blocks of commits, shared by the analyzers.
+    """
+
+    def __init__(
+            self,
+            model,
+            local_repo_path: str = "clones",
+            clone_repo: bool = False,
+            analyzer_factory: Optional[Callable[[str], ProjectAnalyzer]] = None,
+            result_cache: Optional[ResultCache] = None
+    ):
+        """
+        Initializes the predictor.
+
+        Args:
+            model: A fitted estimator exposing `predict`.
+            local_repo_path (str): The directory where the repositories are stored/cloned (default: "clones").
+            clone_repo (bool): Whether missing repositories should be cloned (default: False).
+            analyzer_factory (Optional[Callable]): Builds the analyzer of a project (default: ProjectAnalyzer).
+            result_cache (Optional[ResultCache]): Cache of the changed blocks of commits (default: None, no cache).
+        """
+        self.model = model
+        self.local_repo_path = local_repo_path
+        self.clone_repo = clone_repo
+        self.result_cache = result_cache
+        self.analyzer_factory = analyzer_factory or self.build_analyzer
+        self.analyzers: Dict[str, ProjectAnalyzer] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, model_path: str, **kwargs) -> "DefectPredictor":
+        """
+        Loads a model serialized with `joblib.dump` and wraps it in a predictor.
+
+        Args:
+            model_path (str): The path of the serialized model.
+            **kwargs: Forwarded to the constructor.
+
+        Returns:
+            DefectPredictor: The predictor.
+        """
+        import joblib
+
+        return cls(joblib.load(model_path), **kwargs)
+
+    def build_analyzer(self, project: str) -> ProjectAnalyzer:
+        repo_url = f"https://github.com/{project}.git"
+        return ProjectAnalyzer(project, repo_url, self.local_repo_path, clone_repo=self.clone_repo,
+                               result_cache=self.result_cache)
+
+    def get_analyzer(self, project: str) -> ProjectAnalyzer:
+        """
+        Returns the warm analyzer of a project, creating it on first use.
+
+        Args:
+            project (str): The project name (e.g. "TFDefect/trivial-tf-changes").
+
+        Returns:
+            ProjectAnalyzer: The analyzer of the project.
+        """
+        with self.lock:
+            if project not in self.analyzers:
+                self.analyzers[project] = self.analyzer_factory(project)
+            return self.analyzers[project]
+
+    def score_commits(self, requests: List[Tuple[str, str]]) -> List[dict]:
+        """
+        Scores a batch of commits with a single call to the model.
+
+        Args:
+            requests (List[Tuple[str, str]]): The (project, commit hash) pairs to score.
+
+        Returns:
+            List[dict]: One result per request, in order, holding the changed TF files and
+                        their scored blocks, or an "error" message if the commit could not be analyzed.
+        """
+        results = []
+        all_features = []
+        slices = []
+
+        for project, commit_hash in requests:
+            result = {"project": project, "commit": commit_hash}
+            try:
+                analyzer = self.get_analyzer(project)
+                if analyzer.resolve_commit_hash(commit_hash) is None:
+                    raise ValueError(f"Commit {commit_hash} not found in {project}")
+                changed_blocks = analyzer.identify_changed_block_from_specific_commits(commit_hash,
+                                                                                      only_files_to_parse=True)
+                X, references = extract_block_features(changed_blocks)
+            except Exception as e:
+                result["error"] = str(e)
+                X, references = [], []
+
+            slices.append((len(all_features), references))
+            all_features.extend(X)
+            results.append(result)
+
+        predictions = self.model.predict(all_features) if all_features else []
+
+        for result, (offset, references) in zip(results, slices):
+            if "error" not in result:
+                result["changedFiles"] = group_predictions_by_file(
+                    references, predictions[offset:offset + len(references)]
+                )
+        return results
+
+
+class PredictionServer:
+    """
+    A long-running HTTP server answering defect predictions for commits. Requests are queued
+    and scored in batches by a single worker thread, which also keeps the analysis of commits
+    sequential (TerraMetricsLoader works on shared temporary files).
+
+    Endpoints:
+        POST /predict  {"project": "...", "commit": "..."} or {"project": "...", "commits": [...]}
+        GET  /health
+    """
+
+    def __init__(
+            self,
+            predictor: DefectPredictor,
+            host: str = "127.0.0.1",
+            port: int = 8765,
+            max_batch_size: int = 32,
+            max_batch_wait: float = 0.005,
+            request_timeout: float = 300.0
+    ):
+        """
+        Initializes the server without starting it.
+
+        Args:
+            predictor (DefectPredictor): The warm predictor.
+            host (str): The interface to listen on (default: "127.0.0.1").
+            port (int): The port to listen on, 0 for any free port (default: 8765).
+            max_batch_size (int): The maximum number of queued commits scored together (default: 32).
+            max_batch_wait (float): Seconds to wait for more requests before scoring a batch (default: 0.005).
+            request_timeout (float): Seconds a request waits for its result (default: 300).
+        """
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait = max_batch_wait
+        self.request_timeout = request_timeout
+        self.pending = queue.Queue()
+        self.stopped = threading.Event()
+
+        self.httpd = ThreadingHTTPServer((host, port), PredictionRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.prediction_server = self
+        self.threads = []
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.httpd.server_address[:2]
+
+    @property
+    def url(self) -> str:
+        host, port = self.address
+        return f"http://{host}:{port}"
+
+    def submit(self, project: str, commit_hash: str) -> Future:
+        """
+        Queues a commit for scoring.
+
+        Args:
+            project (str): The project name.
+            commit_hash (str): The hash of the commit to score.
+
+        Returns:
+            Future: Resolved with the result of the commit once its batch is scored.
+        """
+        future = Future()
+        self.pending.put(((project, commit_hash), future))
+        return future
+
+    def next_batch(self) -> list:
+        try:
+            batch = [self.pending.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+
+        # Give concurrent requests a short window to join the batch
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self.pending.get(timeout=self.max_batch_wait))
+            except queue.Empty:
+                break
+        return batch
+
+    def process_batches(self):
+        while not self.stopped.is_set():
+            batch = self.next_batch()
+            if not batch:
+                continue
+
+            try:
+                results = self.predictor.score_commits([request for request, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+    def start(self) -> "PredictionServer":
+        """
+        Starts the batching worker and the HTTP listener in background threads.
+
+        Returns:
+            PredictionServer: The started server.
+        """
+        self.threads = [
+            threading.Thread(target=self.process_batches, daemon=True),
+            threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        ]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def shutdown(self):
+        """
+        Stops the HTTP listener and the batching worker.
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+
+    def send_json(self, status: int, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        self.send_json(200, {"status": "ok", "queued": self.server.prediction_server.pending.qsize()})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            project = payload["project"]
+            commits = payload["commits"] if "commits" in payload else [payload["commit"]]
+            if not isinstance(commits, list) or not all(isinstance(commit, str) for commit in commits):
+                raise TypeError("commits must be a list of commit hashes")
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {"error": f"Invalid request: {e}"})
+            return
+
+        server = self.server.prediction_server
+        futures = [server.submit(project, commit_hash) for commit_hash in commits]
+        try:
+            results = [future.result(timeout=server.request_timeout) for future in futures]
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+            return
+        self.send_json(200, {"results": results})
+
+    def log_message(self, format, *args):
+        # Keep the server output for the analysis logs
+        pass
+
+
+class PredictionClient:
+    """
+    A minimal client of the PredictionServer.
+
+    Attributes:
+        url (str): The base URL of the server.
+        timeout (float): Seconds to wait for a response.
+    """
+
+    def __init__(self, url: str = "http://127.0.0.1:8765", timeout: float = 300.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def predict(self, project: str, commits: List[str]) -> List[dict]:
+        """
+        Scores commits of a project.
+
+        Args:
+            project (str): The project name.
+            commits (List[str]): The hashes of the commits to score.
+
+        Returns:
+            List[dict]: One result per commit, in order.
+        """
+        body = json.dumps({"project": project, "commits": list(commits)}).encode("utf-8")
+        request = urllib.request.Request(
+            f"{self.url}/predict", data=body, headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())["results"]
+
+    def health(self) -> dict:
+        with urllib.request.urlopen(f"{self.url}/health", timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve defect predictions for commits of Terraform repositories.")
+    parser.add_argument("--model", required=True, help="Path of a model serialized with joblib.dump")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--local-path", default="clones", help="Directory where the repositories are stored/cloned")
+    parser.add_argument("--clone", action="store_true", help="Clone repositories that are not available locally")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--result-cache", help="SQLite database caching the changed blocks of analyzed commits")
+    parser.add_argument("--cache-ttl", type=float, help="Lifetime of the cached results, in seconds")
+    args = parser.parse_args()
+
+    result_cache = ResultCache(args.result_cache, ttl_seconds=args.cache_ttl) if args.result_cache else None
+    predictor = DefectPredictor.from_file(args.model, local_repo_path=args.local_path, clone_repo=args.clone,
+                                          result_cache=result_cache)
+    server = PredictionServer(predictor, args.host, args.port, max_batch_size=args.max_batch_size).start()
+    print(f"🚀 Prediction server listening on {server.url}")
+    try:
+        server.stopped.wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,224 @@
+import os
+import shutil
+import tempfile
+from typing import Callable, Iterable, Optional, Sequence
+
+import joblib
+import numpy as np
+
+from core.mining.ParallelCommitMiner import ParallelCommitMiner
+from utility.block_features import extract_block_features
+
+
+class IncrementalTrainer:
+    """
+    Trains a defect prediction model out-of-core over a stream of mined commits. Blocks are
+    mined and turned into features by a ParallelCommitMiner, buffered into memory-mapped
+    chunk arrays of fixed size, and fed to an estimator supporting `partial_fit`. The model
+    is checkpointed periodically so that an interrupted training can be resumed.
+
+    Attributes:
+        estimator: The estimator being trained; must implement `partial_fit`.
+        classes (Sequence[int]): All the labels the estimator will ever see.
+        chunk_size (int): The maximum number of blocks per `partial_fit` call.
+        n_features (int): The number of features per block.
+        checkpoint_path (Optional[str]): Where the model is checkpointed (default: no checkpoint).
+        checkpoint_every (int): Checkpoint after this many fitted chunks.
+        num_fitted_chunks (int): The number of chunks fitted so far.
+        num_fitted_commits (int): The number of input commits whose blocks are all fitted.
+        work_dir (str): The directory of the memory-mapped chunk arrays.
+    """
+
+    def __init__(
+            self,
+            estimator=None,
+            classes: Sequence[int] = (0, 1),
+            chunk_size: int = 10000,
+            n_features: int = 1,
+            checkpoint_path: Optional[str] = None,
+            checkpoint_every: int = 10,
+            work_dir: Optional[str] = None
+    ):
+        """
+        Initializes the trainer.
+
+        Args:
+            estimator: An estimator implementing `partial_fit` (default: logistic SGDClassifier).
+            classes (Sequence[int]): All the labels (default: (0, 1)).
+            chunk_size (int): The maximum number of blocks per `partial_fit` call (default: 10000).
+            n_features (int): The number of features per block (default: 1, the block size).
+            checkpoint_path (Optional[str]): Where the model is checkpointed (default: None).
+            checkpoint_every (int): Checkpoint after this many fitted chunks (default: 10).
+            work_dir (Optional[str]): Directory of the memory-mapped chunk arrays (default: a temporary
+                                      directory, removed by `close`).
+        """
+        if estimator is None:
+            from sklearn.linear_model import SGDClassifier
+            estimator = SGDClassifier(loss="log_loss", random_state=42)
+        if not hasattr(estimator, "partial_fit"):
+            raise ValueError(f"{type(estimator).__name__} does not support partial_fit")
+
+        self.estimator = estimator
+        self.classes = np.asarray(classes)
+        self.chunk_size = chunk_size
+        self.n_features = n_features
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.requested_work_dir = work_dir
+        self.work_dir = None
+        self.num_fitted_chunks = 0
+        self.num_fitted_commits = 0
+        self.last_checkpoint_chunks = 0
+        self.X_chunk = None
+        self.y_chunk = None
+        self.open_buffers()
+
+    def open_buffers(self):
+        # The chunk buffers live on disk and are reused for every chunk
+        self.work_dir = self.requested_work_dir or tempfile.mkdtemp(prefix="training_chunks_")
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.X_chunk = np.lib.format.open_memmap(
+            os.path.join(self.work_dir, "X_chunk.npy"), mode="w+", dtype=np.float64,
+            shape=(self.chunk_size, self.n_features)
+        )
+        self.y_chunk = np.lib.format.open_memmap(
+            os.path.join(self.work_dir, "y_chunk.npy"), mode="w+", dtype=np.int64, shape=(self.chunk_size,)
+        )
+        self.chunk_fill = 0
+        self.commits_in_chunk = 0
+
+    def close(self):
+        """
+        Releases the chunk buffers and deletes their files, and the temporary directory holding them.
+        The buffers are opened again by the next `fit_commits`.
+        """
+        if self.X_chunk is None:
+            return
+        self.X_chunk = None
+        self.y_chunk = None
+        if self.requested_work_dir is None:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+        else:
+            for name in ("X_chunk.npy", "y_chunk.npy"):
+                path = os.path.join(self.work_dir, name)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def save_checkpoint(self):
+        """
+        Saves the estimator and the training progress to `checkpoint_path`.
+        """
+        if self.checkpoint_path is None:
+            return
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Write then rename, so that a crash never leaves a truncated checkpoint
+        tmp_path = self.checkpoint_path + ".tmp"
+        joblib.dump({
+            "estimator": self.estimator,
+            "num_fitted_chunks": self.num_fitted_chunks,
+            "num_fitted_commits": self.num_fitted_commits
+        }, tmp_path)
+        os.replace(tmp_path, self.checkpoint_path)
+        self.last_checkpoint_chunks = self.num_fitted_chunks
+
+    def load_checkpoint(self) -> bool:
+        """
+        Restores the estimator and the training progress from `checkpoint_path`, if it exists.
+
+        Returns:
+            bool: True if a checkpoint was loaded, False otherwise.
+        """
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return False
+        checkpoint = joblib.load(self.checkpoint_path)
+        self.estimator = checkpoint["estimator"]
+        self.num_fitted_chunks = checkpoint["num_fitted_chunks"]
+        self.num_fitted_commits = checkpoint["num_fitted_commits"]
+        self.last_checkpoint_chunks = self.num_fitted_chunks
+        return True
+
+    def flush_chunk(self, checkpoint: bool = True):
+        fitted = self.chunk_fill > 0
+        if fitted:
+            self.estimator.partial_fit(
+                self.X_chunk[:self.chunk_fill], self.y_chunk[:self.chunk_fill], classes=self.classes
+            )
+            self.num_fitted_chunks += 1
+            self.chunk_fill = 0
+
+        self.num_fitted_commits += self.commits_in_chunk
+        self.commits_in_chunk = 0
+        # No checkpoint in the middle of a commit: resuming from it would fit part of the commit twice
+        if checkpoint and self.num_fitted_chunks - self.last_checkpoint_chunks >= self.checkpoint_every:
+            self.save_checkpoint()
+
+    def add_commit(self, X: list, y: list):
+        """
+        Buffers the feature rows and labels of one commit, fitting the current chunk first
+        if the commit does not fit in it, so that checkpoints always fall between commits.
+
+        Args:
+            X (list): The feature rows of the commit's blocks.
+            y (list): The label of each row.
+        """
+        if self.chunk_fill + len(X) > self.chunk_size:
+            self.flush_chunk()
+
+        start = 0
+        while len(X) - start > self.chunk_size:
+            # A single commit larger than a chunk is fitted in several pieces
+            self.X_chunk[:] = X[start:start + self.chunk_size]
+            self.y_chunk[:] = y[start:start + self.chunk_size]
+            self.chunk_fill = self.chunk_size
+            self.flush_chunk(checkpoint=False)
+            start += self.chunk_size
+
+        remaining = len(X) - start
+        if remaining:
+            self.X_chunk[self.chunk_fill:self.chunk_fill + remaining] = X[start:]
+            self.y_chunk[self.chunk_fill:self.chunk_fill + remaining] = y[start:]
+            self.chunk_fill += remaining
+        self.commits_in_chunk += 1
+
+    def fit_commits(
+            self,
+            miner: ParallelCommitMiner,
+            commit_hashes: Iterable[str],
+            labeler: Callable[[str, str, dict], int],
+            resume: bool = False
+    ):
+        """
+        Trains the estimator over a stream of commits.
+
+        Args:
+            miner (ParallelCommitMiner): Mines the commits and extracts the block features in its workers.
+            commit_hashes (Iterable[str]): The commits to train on, in a deterministic order; consumed lazily.
+            labeler (Callable[[str, str, dict], int]): Returns the label of a block given the commit hash,
+                                                       the modified file path and the impacted block.
+            resume (bool): Load the checkpoint and skip the commits it already covers (default: False).
+
+        Returns:
+            The trained estimator.
+        """
+        to_skip = self.num_fitted_commits if resume and self.load_checkpoint() else 0
+
+        def remaining_commits():
+            for position, commit_hash in enumerate(commit_hashes):
+                if position >= to_skip:
+                    yield commit_hash
+
+        if self.X_chunk is None:
+            self.open_buffers()
+        try:
+            for commit_hash, (X, references) in miner.mine(remaining_commits(), transform=extract_block_features):
+                y = [labeler(commit_hash, path, block) for path, block in references]
+                self.add_commit(X, y)
+
+            self.flush_chunk()
+            self.save_checkpoint()
+        finally:
+            self.close()
+        return self.estimator
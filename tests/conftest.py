@@ -0,0 +1,160 @@
+import os
+import re
+import subprocess
+from types import SimpleNamespace
+from typing import Optional
+
+import pytest
+
+
+def build_changed_blocks(commit_hash, status="ok"):
+    """The analysis of a commit changing one file, `<commit_hash>.tf`, whose side after the change has `status`."""
+    def block(block_type, block_name, loc):
+        return {"block": block_type, "block_name": block_name, "block_identifiers": f"{block_type} x {block_name}",
+                "start_block": 1, "end_block": loc, "loc": loc}
+
+    return [{
+        "modifiedFilePath": f"{commit_hash}.tf",
+        "oldFilePath": f"{commit_hash}.tf",
+        "itsChangedBlocks": [
+            {"type": "new", "block": block("resource", "a", 3)},
+            {"type": "fully_removed", "block": block("resource", "b", 4)},
+            {"type": "modified", "block": block("module", "c", 10)}
+        ],
+        "measurements": {"before": {"status": "ok"}, "after": {"status": status}}
+    }]
+
+
+class StubAnalyzer:
+    """
+    Stands in for a ProjectAnalyzer of the project "org/repo", with the commits of `commits`. The commit
+    "missing" does not exist, the analysis of "broken" raises and the measurement of "incomplete" times out.
+    """
+
+    projectName = "org/repo"
+
+    def __init__(self):
+        self.commits = ["a", "incomplete", "b"]
+        self.statuses = {"incomplete": "timeout"}
+        self.on_analyze = None
+        self.analyzed = []
+
+    def resolve_commit_hash(self, commit_hash):
+        return None if commit_hash == "missing" else commit_hash
+
+    def traverse_commits(self):
+        return [SimpleNamespace(hash=commit_hash, committer_date=index)
+                for index, commit_hash in enumerate(self.commits)]
+
+    def identify_changed_blocks_from_commit(self, commit, only_files_to_parse=False):
+        return self.identify_changed_block_from_specific_commits(commit.hash, only_files_to_parse)
+
+    def identify_changed_block_from_specific_commits(self, commit_hash, only_files_to_parse=False):
+        self.analyzed.append(commit_hash)
+        if self.on_analyze is not None:
+            self.on_analyze(commit_hash)
+        if commit_hash == "broken":
+            raise RuntimeError("analysis failed")
+        return build_changed_blocks(commit_hash, self.statuses.get(commit_hash, "ok"))
+
+
+@pytest.fixture
+def stub_analyzer():
+    return StubAnalyzer()
+
+
+@pytest.fixture
+def make_changed_blocks():
+    return build_changed_blocks
+
+
+class GitRepo:
+    """A git repository of the project "org/repo", under `<local_path>/org__repo`."""
+
+    def __init__(self, local_path):
+        self.local_path = str(local_path)
+        self.path = os.path.join(self.local_path, "org__repo")
+        os.makedirs(self.path)
+        self.git("init", "-q")
+
+    def git(self, *args) -> str:
+        return subprocess.run(["git", "-c", "user.name=Dev", "-c", "user.email=dev@example.com", *args],
+                              cwd=self.path, check=True, capture_output=True, text=True).stdout
+
+    def commit(self, files: dict, message: str = "change", author: Optional[str] = None) -> str:
+        """
+        Writes the files (None deletes a file) and commits them.
+
+        Returns:
+            str: The hash of the new commit.
+        """
+        for path, content in files.items():
+            full_path = os.path.join(self.path, *path.split("/"))
+            if content is None:
+                os.remove(full_path)
+                continue
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "w") as file:
+                file.write(content)
+        self.git("add", "-A")
+        self.git("commit", "-q", "--allow-empty", "-m", message, *(["--author", author] if author else []))
+        return self.git("rev-parse", "HEAD").strip()
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    return GitRepo(tmp_path / "clones")
+
+
+class FakeTerraMetrics:
+    """
+    Replaces the TerraMetrics runs of single files: the blocks are the top-level `resource`, `module`,
+    `variable` and `output` blocks, each closed by a `}` line. `statuses` forces the status of a side
+    ("before" or "after"); `calls` records the measured sides.
+    """
+
+    BLOCK_START = re.compile(r'^(resource|module|variable|output)\s+((?:"[^"]*"\s*)+)\{')
+
+    def __init__(self):
+        self.statuses = {}
+        self.calls = []
+
+    def measure_blocks(self, content: str) -> dict:
+        blocks, current = [], None
+        lines = content.split("\n")
+        for number, line in enumerate(lines, 1):
+            match = self.BLOCK_START.match(line)
+            if match and current is None:
+                names = re.findall(r'"([^"]*)"', match.group(2))
+                current = {"block": match.group(1), "block_name": names[-1],
+                           "block_identifiers": " ".join([match.group(1)] + names), "start_block": number,
+                           "numAttrs": 0}
+                if line.rstrip().endswith("}"):
+                    blocks.append({**current, "end_block": number, "loc": 1})
+                    current = None
+            elif current is not None and line.strip() == "}":
+                blocks.append({**current, "end_block": number, "loc": number - current["start_block"] + 1})
+                current = None
+            elif current is not None and "=" in line:
+                current["numAttrs"] += 1
+        return {"head": {"num_lines_of_code": len(lines), "num_blocks": len(blocks)}, "status": 200, "data": blocks}
+
+    def run_service_locator(self, loader, command, target):
+        blob_path = command[command.index("--file") + 1]
+        side = "before" if blob_path == loader.tmp_blob_path_before_change else "after"
+        self.calls.append(side)
+        status = self.statuses.get(side, "ok")
+        if status != "ok":
+            return loader.measurement(status, None, 1, 0.0, f"forced {status}")
+        with open(blob_path, encoding="utf-8") as file:
+            return loader.measurement("ok", self.measure_blocks(file.read()), 1, 0.0)
+
+
+@pytest.fixture
+def fake_terrametrics(monkeypatch):
+    from core.block_extractor.TerraMetricsLoader import TerraMetricsLoader
+
+    fake = FakeTerraMetrics()
+    monkeypatch.setattr(TerraMetricsLoader, "run_service_locator",
+                        lambda loader, command, target: fake.run_service_locator(loader, command, target))
+    return fake
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from core.ProjectAnalyzer import ProjectAnalyzer
+
+MAIN_TF = 'resource "x" "a" {\n  name = "a"\n  size = 1\n}\n'
+
+
+@pytest.fixture
+def analyze(tmp_path, git_repo, fake_terrametrics):
+    git_repo.commit({"main.tf": MAIN_TF})
+    analyzer = ProjectAnalyzer("org/repo", "", git_repo.local_path, work_dir=str(tmp_path))
+
+    def analyze_commit(commit_hash):
+        fake_terrametrics.calls.clear()
+        changed_blocks = analyzer.identify_changed_block_from_specific_commits(commit_hash)
+        return changed_blocks, fake_terrametrics.calls
+
+    return analyze_commit
+
+
+def test_pure_rename_is_not_measured(git_repo, analyze):
+    git_repo.git("mv", "main.tf", "network.tf")
+    changed_blocks, calls = analyze(git_repo.commit({}))
+    assert calls == []
+    assert changed_blocks[0]["itsChangedBlocks"] == []
+    assert changed_blocks[0]["measurements"]["after"]["status"] == "skipped"
+
+
+def test_identical_blobs_are_not_measured(git_repo, analyze):
+    os.chmod(os.path.join(git_repo.path, "main.tf"), 0o755)
+    changed_blocks, calls = analyze(git_repo.commit({}))
+    assert calls == []
+    assert changed_blocks[0]["itsChangedBlocks"] == []
+
+
+def test_comment_only_changes_are_not_measured(git_repo, analyze):
+    changed_blocks, calls = analyze(git_repo.commit({"main.tf": "# The resource\n" + MAIN_TF}))
+    assert calls == []
+    assert changed_blocks[0]["itsChangedBlocks"] == []
+
+
+@pytest.mark.parametrize("content", [
+    "/*\n" + MAIN_TF + "*/\n",
+    MAIN_TF + 'locals {\n  script = <<EOF\necho\nEOF\n}\n'
+])
+def test_multiline_comments_and_heredocs_are_measured(git_repo, analyze, content):
+    _, calls = analyze(git_repo.commit({"main.tf": content}))
+    assert sorted(calls) == ["after", "before"]
+
+
+def test_added_and_deleted_files_are_measured_on_one_side(git_repo, analyze):
+    changed_blocks, calls = analyze(git_repo.commit({"network.tf": MAIN_TF.replace('"a"', '"b"')}))
+    assert calls == ["after"]
+    assert [impacted["type"] for impacted in changed_blocks[0]["itsChangedBlocks"]] == ["new"]
+
+    changed_blocks, calls = analyze(git_repo.commit({"main.tf": None}))
+    assert calls == ["before"]
+    assert changed_blocks[0]["measurements"]["after"]["status"] == "skipped"
+    assert {impacted["type"] for impacted in changed_blocks[0]["itsChangedBlocks"]} == {"fully_removed"}
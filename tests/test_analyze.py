@@ -0,0 +1,46 @@
+import json
+
+import analyze
+from core.cache.ResultCache import ResultCache
+
+MAIN_TF = 'resource "x" "a" {{\n  name = "a"\n  size = {size}\n}}\n\nresource "x" "b" {{\n  name = "b"\n}}\n'
+
+
+def test_workers_share_the_result_cache(tmp_path, git_repo, capsys):
+    git_repo.commit({"main.tf": 'variable "a" {}\n'})
+    for index in range(4):
+        git_repo.commit({"main.tf": f'# Version {index}\nvariable "a" {{}}\n', "README.md": f"{index}\n"})
+    cache_path = str(tmp_path / "cache.db")
+    argv = ["--project", "org/repo", "--local-path", git_repo.local_path, "--workers", "2",
+            "--result-cache", cache_path, "--granularity", "file", "HEAD~4..HEAD"]
+
+    outputs = []
+    for _ in range(2):
+        assert analyze.main(argv) == 0
+        outputs.append([json.loads(line) for line in capsys.readouterr().out.splitlines()])
+
+    assert outputs[0] == outputs[1]
+    assert [line["modifiedFilePath"] for line in outputs[0]] == ["main.tf"] * 4
+    assert ResultCache(cache_path).stats()["entries"] == 4
+
+
+def test_blocks_carry_their_measurements(tmp_path, git_repo, fake_terrametrics, monkeypatch, capsys):
+    git_repo.commit({"main.tf": MAIN_TF.format(size=1)})
+    commit_hash = git_repo.commit({"main.tf": MAIN_TF.format(size=2)})
+    # TerraMetrics measures its temporary files in the relative "tmp" directory
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "tmp").mkdir()
+    argv = ["--project", "org/repo", "--local-path", git_repo.local_path, commit_hash]
+
+    assert analyze.main(argv) == 0
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert {(line["type"], line["block"]["block_identifiers"]) for line in lines} == {("modified", "resource x a")}
+    assert all(line["measurements"]["before"]["status"] == "ok" for line in lines)
+    assert all((line["addedLines"], line["deletedLines"]) == (1, 1) for line in lines)
+
+    # Without the side before the change, every block looks new: the exit status reports it
+    fake_terrametrics.statuses["before"] = "timeout"
+    assert analyze.main(argv) == 1
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line["type"] for line in lines] == ["new", "new"]
+    assert all(line["measurements"]["before"]["status"] == "timeout" for line in lines)
@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import pytest
+
+from core.ProjectAnalyzer import ProjectAnalyzer
+from core.block_extractor.ImpactedBlockIdentifier import ImpactedBlockIdentifier
+from core.change.Additions import Additions
+from core.change.Deletions import Deletions
+
+# Deletes the lines 2 and 5 to 6 of the old file, adds the lines 2 to 3 and 6 of the new file
+DIFF = (
+    "@@ -1,7 +1,7 @@\n"
+    " line 1\n"
+    "-old line 2\n"
+    "+new line 2\n"
+    "+new line 3\n"
+    " line 3\n"
+    " line 4\n"
+    "-old line 5\n"
+    "-old line 6\n"
+    "+new line 6\n"
+    " line 7\n"
+)
+RANGES = [(1, 3), (2, 2), (3, 6), (6, 9), (5, 4)]
+
+
+@pytest.mark.parametrize("inclusive, added, deleted", [
+    (False, [1, 0, 0, 0, 0], [1, 0, 1, 0, 0]),
+    (True, [2, 1, 2, 1, 0], [1, 1, 2, 1, 0])
+])
+def test_lines_are_counted_in_all_blocks_at_once(inclusive, added, deleted):
+    mod = SimpleNamespace(diff=DIFF)
+    assert Additions(mod).count_added_lines_in_blocks(RANGES, inclusive) == added
+    assert Deletions(mod).count_deleted_lines_in_blocks(RANGES, inclusive) == deleted
+
+
+def test_exclusive_counts_match_the_per_block_counts():
+    mod = SimpleNamespace(diff=DIFF)
+    assert Additions(mod).count_added_lines_in_blocks(RANGES) == [
+        Additions(mod, start, end).count_added_lines_in_a_block() for start, end in RANGES]
+    assert Deletions(mod).count_deleted_lines_in_blocks(RANGES) == [
+        Deletions(mod, start, end).count_deleted_lines_in_a_block() for start, end in RANGES]
+    assert Additions(mod).count_added_lines_in_blocks([]) == []
+
+
+def test_is_dict_in_list_reads_the_wrapped_blocks():
+    impacted_blocks = [{"type": "new", "block": {"block_identifiers": "resource x a"}}]
+    identifier = ImpactedBlockIdentifier.__new__(ImpactedBlockIdentifier)
+    assert identifier.is_dict_in_list({"block_identifiers": "resource x a"}, impacted_blocks)
+    assert not identifier.is_dict_in_list({"block_identifiers": "resource x b"}, impacted_blocks)
+
+
+def test_churn_is_attached_to_every_impacted_block(tmp_path, git_repo, fake_terrametrics):
+    git_repo.commit({"main.tf": (
+        'resource "x" "a" {\n  name = "a"\n  size = 1\n}\n\n'
+        'resource "x" "b" {\n  name = "b"\n}\n'
+    )})
+    commit_hash = git_repo.commit({"main.tf": (
+        'resource "x" "a" {\n  name = "a"\n  size = 2\n  tags = {}\n}\n\n'
+        'output "c" {\n  value = 1\n}\n'
+    )})
+    analyzer = ProjectAnalyzer("org/repo", "", git_repo.local_path, work_dir=str(tmp_path))
+
+    [changed_file] = analyzer.identify_changed_block_from_specific_commits(commit_hash)
+    churn = {(impacted["type"], impacted["block"]["block_identifiers"], impacted["addedLines"],
+              impacted["deletedLines"]) for impacted in changed_file["itsChangedBlocks"]}
+    # "a" gains lines 3-4 and loses its old line 3; "b" loses its first two lines to "c", sharing the "}"
+    assert churn == {("modified", "resource x a", 2, 1), ("fully_removed", "resource x b", 0, 2),
+                     ("new", "output c", 2, 0)}
@@ -0,0 +1,14 @@
+from core.history.BlockLineageIndex import BlockLineageIndex
+
+
+def test_incomplete_commits_are_indexed_on_a_later_update(tmp_path, stub_analyzer):
+    index = BlockLineageIndex(str(tmp_path / "blocks.db"))
+
+    assert index.update(stub_analyzer) == 2
+    assert not index.is_commit_indexed("org/repo", "incomplete")
+    assert index.get_block_history("org/repo", "resource x a", file_path="incomplete.tf") == []
+
+    stub_analyzer.statuses.clear()
+    assert index.update(stub_analyzer) == 1
+    assert index.count_block_changes("org/repo", "resource x a", file_path="incomplete.tf") == 1
+    index.close()
@@ -0,0 +1,49 @@
+import re
+
+import nltk
+import pytest
+from nltk.stem import PorterStemmer
+
+from utility.commit_filters import (beSafeFromSpecialCommit, filter_safe_commit_messages, preprocess,
+                                    preprocess_batch)
+
+MESSAGES = [
+    "Fix the bucket policy. Add tags to the buckets!",
+    "Merge branch 'main' into feature",
+    "Revert \"Update the VPC module\"",
+    "Fix the bucket policy. Add tags to the buckets!",
+    "update variables and outputs",
+    "",
+    "Bump the provider version to 5.0; the tests were updated",
+    "update variables and outputs"
+] * 3
+STOP_WORDS = {"the", "to", "and", "into", "were"}
+
+
+def simple_preprocess(doc):
+    # Like gensim's simple_preprocess, without the dependency
+    return re.findall(r"[a-z]{2,15}", doc.lower())
+
+
+@pytest.fixture
+def tokenizers(monkeypatch):
+    # The punkt models are not needed to compare both paths; forked workers inherit the patches
+    monkeypatch.setattr(nltk, "sent_tokenize", lambda text: [s for s in re.split(r"(?<=[.!?;])\s+", text) if s])
+    monkeypatch.setattr(nltk.tokenize, "word_tokenize", lambda text: re.findall(r"\w+|[^\w\s]", text))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batch_matches_the_per_message_preprocessing(tokenizers, workers):
+    expected = [preprocess(message, nltk, PorterStemmer(), STOP_WORDS, simple_preprocess) for message in MESSAGES]
+    processed = preprocess_batch(MESSAGES, PorterStemmer(), STOP_WORDS, simple_preprocess, workers=workers,
+                                 chunksize=2, nltk=nltk)
+
+    assert processed == expected
+    # Duplicate messages get their own lists
+    assert processed[0] is not processed[3]
+
+
+def test_safe_messages_match_the_single_message_filter():
+    lowered = [message.lower() for message in MESSAGES]
+    assert filter_safe_commit_messages(lowered) == [beSafeFromSpecialCommit(message) for message in lowered]
+    assert filter_safe_commit_messages(lowered)[:3] == [True, False, False]
@@ -0,0 +1,47 @@
+import sys
+import threading
+
+from core.mining.CommitPreScanner import FIELD_SEPARATOR, RECORD_SEPARATOR, CommitPreScanner
+
+
+def test_only_commits_worth_analysis_are_selected(git_repo):
+    added = git_repo.commit({"main.tf": 'variable "a" {}\n'}, message="Add a variable")
+    git_repo.commit({"README.md": "Docs\n"}, message="Document")
+    git_repo.commit({"tests/main.tf": 'variable "t" {}\n'}, message="Add a test")
+    git_repo.git("checkout", "-q", "-b", "side")
+    side = git_repo.commit({"side.tf": 'variable "s" {}\n'}, message="Add a side variable")
+    git_repo.git("checkout", "-q", "-")
+    main = git_repo.commit({"main.tf": 'variable "b" {}\n'}, message="Rename the variable")
+    git_repo.git("merge", "-q", "--no-ff", "-m", "Join the side branch", "side")
+    git_repo.git("revert", "--no-edit", main)
+    spaces = git_repo.commit({"dir with spaces/a b.tf": 'variable "c" {}\n', "new\nline.tf": 'variable "d" {}\n'},
+                             message="Add odd paths")
+
+    scanner = CommitPreScanner(git_repo.path)
+    commits = {commit["hash"]: commit for commit in scanner.iter_commit_metadata()}
+    assert sorted(commits[spaces]["paths"]) == ["dir with spaces/a b.tf", "new\nline.tf"]
+    assert commits[added]["message"].startswith("Add a variable")
+
+    # The README, test-only, merge and revert commits are skipped
+    assert scanner.select_commit_hashes() == [added, side, main, spaces]
+
+
+class NoisyScanner(CommitPreScanner):
+    """Runs a command printing more warnings than a pipe holds before the commit records."""
+
+    def build_command(self, revision_range, since, until):
+        fields = ["a" * 40, "", "0", "Dev", "Message\0a.tf\0"]
+        code = (f"import sys; sys.stderr.write('warning\\n' * 100000); "
+                f"sys.stdout.write({RECORD_SEPARATOR + FIELD_SEPARATOR.join(fields)!r})")
+        return [sys.executable, "-c", code]
+
+
+def test_warnings_do_not_block_the_scan(tmp_path):
+    commits = []
+    thread = threading.Thread(target=lambda: commits.extend(NoisyScanner(str(tmp_path)).iter_commit_metadata()),
+                              daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+
+    assert not thread.is_alive()
+    assert [commit["paths"] for commit in commits] == [["a.tf"]]
@@ -0,0 +1,71 @@
+from collections import Counter
+
+import pytest
+
+from core.ProjectAnalyzer import ProjectAnalyzer
+from core.mining.CommitSampler import CommitSampler
+
+STRATA = {
+    "large": [f"l{index}" for index in range(60)],
+    "medium": [f"m{index}" for index in range(30)],
+    "small": [f"s{index}" for index in range(10)]
+}
+
+
+def test_every_prefix_of_the_sample_is_proportional():
+    sample = list(CommitSampler(None, seed=1).iter_sample(STRATA))
+
+    assert sorted(commit_hash for _, commit_hash in sample) == sorted(sum(STRATA.values(), []))
+    population = sum(len(commit_hashes) for commit_hashes in STRATA.values())
+    for num_drawn in range(len(STRATA), population + 1):
+        drawn = Counter(stratum for stratum, _ in sample[:num_drawn])
+        for stratum, commit_hashes in STRATA.items():
+            assert abs(drawn[stratum] - len(commit_hashes) * num_drawn / population) <= 1
+
+
+def test_complete_sample_estimates_the_exact_mean():
+    strata = {"a": ["a1", "a2", "a3"], "b": ["b1"]}
+    observations = {"a": [{"blocks": 1.0}, {"blocks": 2.0}, {"blocks": 3.0}], "b": [{"blocks": 10.0}]}
+    estimate = CommitSampler(None, metrics={"blocks": len}).estimate(strata, observations, elapsed=1.0)
+
+    blocks = estimate["metrics"]["blocks"]
+    assert estimate["complete"] and estimate["covers_population"]
+    assert blocks["mean"] == pytest.approx(4.0)
+    # Every commit is observed: no sampling error is left
+    assert blocks["ci_low"] == pytest.approx(4.0) and blocks["ci_high"] == pytest.approx(4.0)
+    assert blocks["total"] == pytest.approx(16.0)
+
+
+def test_stratified_estimate_weights_the_strata_by_size():
+    strata = {"a": [f"a{index}" for index in range(30)], "b": [f"b{index}" for index in range(10)]}
+    observations = {"a": [{"blocks": 1.0}, {"blocks": 3.0}], "b": [{"blocks": 10.0}, {"blocks": 14.0}]}
+    estimate = CommitSampler(None, metrics={"blocks": len}).estimate(strata, observations, elapsed=1.0)
+
+    blocks = estimate["metrics"]["blocks"]
+    assert blocks["mean"] == pytest.approx(0.75 * 2.0 + 0.25 * 12.0)
+    assert blocks["ci_low"] < blocks["mean"] < blocks["ci_high"]
+    assert estimate["sampled_commits"] == 4 and not estimate["complete"]
+
+
+def test_unsampled_strata_are_flagged():
+    strata = {"a": ["a1", "a2"], "b": ["b1", "b2", "b3"]}
+    estimate = CommitSampler(None, metrics={"blocks": len}).estimate(strata, {"a": [{"blocks": 2.0}]}, elapsed=1.0)
+
+    assert estimate["covered_commits"] == 2 and estimate["population_commits"] == 5
+    assert not estimate["covers_population"]
+    assert not estimate["metrics"]["blocks"]["covers_population"]
+
+
+def test_only_tf_files_are_counted(tmp_path, git_repo, fake_terrametrics):
+    git_repo.commit({"main.tf": 'variable "a" {}\n', "README.md": "0\n"})
+    for index in range(1, 5):
+        git_repo.commit({"main.tf": f'variable "a" {{}}\nvariable "v{index}" {{}}\n', "README.md": f"{index}\n"},
+                        author=f"Author {index} <a{index}@example.com>")
+    analyzer = ProjectAnalyzer("org/repo", "", git_repo.local_path, work_dir=str(tmp_path))
+
+    estimate = CommitSampler(analyzer).sample()
+
+    assert estimate["complete"]
+    assert estimate["metrics"]["changed_tf_files"]["mean"] == pytest.approx(1.0)
+    # README.md is not measured: main.tf is measured on one side when added, then on both sides
+    assert len(fake_terrametrics.calls) == 1 + 2 * 4
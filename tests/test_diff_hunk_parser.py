@@ -0,0 +1,81 @@
+import random
+
+from pydriller.domain.commit import ModifiedFile
+
+from core.change.Additions import Additions
+from core.change.Deletions import Deletions
+from core.change.DiffHunkParser import DiffHunkParser
+from utility.TerraformSpecialCases import UtilityChange
+
+LINE_POOL = [
+    'resource "aws_s3_bucket" "logs" {', '  bucket = "logs"', "}", "", "   ", "# a comment", "// another comment",
+    "/* single line */", "/* opening", "inside comment", "closing */", '  description = "a description"',
+    '  description = ""', "  description = <<EOT", "  description = <<-DOC", "EOT", "DOC", "heredoc text",
+    "  tags = {", '    Name = "x"', "  }", "module \"vpc\" {", "-- starts with dashes", "++ starts with pluses",
+    "@ at sign", "\tcount = 2", "trailing spaces   "
+]
+
+
+class DiffOnlyModifiedFile(ModifiedFile):
+    """A ModifiedFile whose diff is given directly, to run PyDriller's own `diff_parsed`."""
+
+    def __init__(self, diff: str):
+        self._diff = diff
+
+    @property
+    def diff(self):
+        return self._diff
+
+
+def random_diff(rng: random.Random) -> str:
+    lines = []
+    old_line, new_line = rng.randint(1, 50), rng.randint(1, 50)
+    for _ in range(rng.randint(0, 4)):
+        body = []
+        old_count = new_count = 0
+        for _ in range(rng.randint(1, 25)):
+            kind = rng.choice(" +-")
+            body.append(kind + rng.choice(LINE_POOL))
+            old_count += kind != "+"
+            new_count += kind != "-"
+            if rng.random() < 0.03:
+                body.append(r"\ No newline at end of file")
+        lines.append(f"@@ -{old_line},{old_count} +{new_line},{new_count} @@" + rng.choice(["", " resource {"]))
+        lines.extend(body)
+        old_line += old_count + rng.randint(1, 20)
+        new_line += new_count + rng.randint(1, 20)
+    return "\n".join(lines) + rng.choice(["", "\n"])
+
+
+def test_parser_matches_diff_parsed_and_exclude_special_lines():
+    rng = random.Random(29)
+    utility = UtilityChange()
+    for _ in range(5000):
+        diff = random_diff(rng)
+        expected = DiffOnlyModifiedFile(diff).diff_parsed
+        expected_added = utility.exclude_special_lines(expected["added"])
+        expected_deleted = utility.exclude_special_lines(expected["deleted"])
+
+        parsed = DiffHunkParser(diff, keep_content=True)
+        assert parsed.added_lines_content == expected_added, diff
+        assert parsed.deleted_lines_content == expected_deleted, diff
+        assert list(parsed.added_lines) == [number for number, _ in expected_added]
+        assert list(parsed.deleted_lines) == [number for number, _ in expected_deleted]
+
+        # Without content, only the line numbers are kept
+        numbers_only = DiffHunkParser(diff)
+        assert numbers_only.added_lines == parsed.added_lines
+        assert numbers_only.deleted_lines == parsed.deleted_lines
+        assert numbers_only.added_lines_content is None
+
+
+def test_additions_and_deletions_load_content_lazily():
+    diff = "@@ -1,2 +1,2 @@\n-  bucket = \"a\"\n+  bucket = \"b\"\n+# comment\n resource"
+    mod = DiffOnlyModifiedFile(diff)
+    parsed = DiffHunkParser(diff)
+    additions = Additions(mod, parsed_diff=parsed)
+    deletions = Deletions(mod, parsed_diff=parsed)
+    assert list(additions.get_added_lines_in_a_file()) == [1]
+    assert list(deletions.get_deleted_lines_in_a_file()) == [1]
+    assert additions.added_lines_content == [(1, '  bucket = "b"')]
+    assert deletions.deleted_lines_content == [(1, '  bucket = "a"')]
@@ -0,0 +1,26 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["git", "pydriller", "pandas", "sklearn", "numpy"]
+
+
+@pytest.mark.parametrize("module", ["core.ProjectAnalyzer", "utility.filter_values", "utility.commit_filters"])
+def test_import_does_not_load_heavy_dependencies(module):
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(json.dumps({{'elapsed': elapsed, 'loaded': [name for name in {HEAVY_MODULES!r} if name in sys.modules]}}))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output)
+
+    assert result["loaded"] == []
+    # Generous: the heavy dependencies alone take about half a second
+    assert result["elapsed"] < 2.0
@@ -0,0 +1,76 @@
+import os
+
+import joblib
+
+from core.training.IncrementalTrainer import IncrementalTrainer
+
+
+class RowCounter:
+    """A stand-in estimator counting the rows it is fitted on."""
+
+    def __init__(self):
+        self.num_rows = 0
+
+    def partial_fit(self, X, y, classes=None):
+        self.num_rows += len(X)
+        return self
+
+
+class StubMiner:
+
+    def __init__(self, rows_per_commit):
+        self.rows_per_commit = rows_per_commit
+
+    def mine(self, commit_hashes, transform=None):
+        for commit_hash in commit_hashes:
+            num_rows = self.rows_per_commit[commit_hash]
+            references = [(f"{commit_hash}.tf", {"block": {"loc": 1}})] * num_rows
+            yield commit_hash, ([[1.0]] * num_rows, references)
+
+
+def test_checkpoints_fall_between_commits(tmp_path):
+    rows_per_commit = {"a": 1, "b": 7, "c": 2, "d": 5}
+    checkpoint_path = str(tmp_path / "model.joblib")
+    trainer = IncrementalTrainer(RowCounter(), chunk_size=2, checkpoint_path=checkpoint_path, checkpoint_every=1)
+
+    checkpoints = []
+    save_checkpoint = trainer.save_checkpoint
+
+    def record_checkpoint():
+        save_checkpoint()
+        checkpoints.append(joblib.load(checkpoint_path))
+
+    trainer.save_checkpoint = record_checkpoint
+    trainer.fit_commits(StubMiner(rows_per_commit), list(rows_per_commit), labeler=lambda *args: 0)
+
+    assert trainer.estimator.num_rows == sum(rows_per_commit.values())
+    commits = list(rows_per_commit)
+    for checkpoint in checkpoints:
+        # Exactly the rows of the commits counted as fitted, never part of a commit
+        fitted_rows = sum(rows_per_commit[commit] for commit in commits[:checkpoint["num_fitted_commits"]])
+        assert checkpoint["estimator"].num_rows == fitted_rows
+
+
+def test_resume_skips_fitted_commits(tmp_path):
+    rows_per_commit = {"a": 3, "b": 5, "c": 1}
+    checkpoint_path = str(tmp_path / "model.joblib")
+    estimator = RowCounter()
+    estimator.num_rows = 8
+    joblib.dump({"estimator": estimator, "num_fitted_chunks": 4, "num_fitted_commits": 2}, checkpoint_path)
+
+    trainer = IncrementalTrainer(RowCounter(), chunk_size=2, checkpoint_path=checkpoint_path)
+    trainer.fit_commits(StubMiner(rows_per_commit), list(rows_per_commit), labeler=lambda *args: 0, resume=True)
+    assert trainer.estimator.num_rows == 9
+    assert trainer.num_fitted_commits == 3
+
+
+def test_temporary_buffers_are_removed():
+    trainer = IncrementalTrainer(RowCounter(), chunk_size=4)
+    work_dir = trainer.work_dir
+    assert os.path.isdir(work_dir)
+    trainer.fit_commits(StubMiner({"a": 3}), ["a"], labeler=lambda *args: 0)
+    assert not os.path.exists(work_dir)
+
+    # The buffers are opened again for the next training
+    trainer.fit_commits(StubMiner({"b": 2}), ["b"], labeler=lambda *args: 0)
+    assert trainer.estimator.num_rows == 5
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from core.ProjectAnalyzer import ProjectAnalyzer
+from core.cache.ResultCache import ResultCache
+from core.mining.ParallelCommitMiner import ParallelCommitMiner
+
+
+def test_failed_commits_are_reported_and_skipped(stub_analyzer):
+    errors = []
+    mined = list(ParallelCommitMiner(stub_analyzer).mine(
+        ["a", "missing", "broken", "b"], on_error=lambda commit_hash, error: errors.append((commit_hash, error))
+    ))
+
+    assert [commit_hash for commit_hash, _ in mined] == ["a", "b"]
+    assert errors == [("missing", "Commit missing not found"), ("broken", "RuntimeError: analysis failed")]
+
+
+def test_failures_are_raised_without_error_handler(stub_analyzer):
+    with pytest.raises(RuntimeError):
+        list(ParallelCommitMiner(stub_analyzer).mine(["a", "broken"]))
+
+
+def cache_connection_of_worker(changed_blocks):
+    from core.mining import ParallelCommitMiner as miner_module
+    return os.getpid(), id(miner_module.worker_analyzer.result_cache.connection)
+
+
+def test_workers_open_their_own_cache_connection(tmp_path, git_repo):
+    git_repo.commit({"main.tf": 'variable "a" {}\n'})
+    # Comment-only changes, which are not measured with TerraMetrics
+    commit_hashes = [git_repo.commit({"main.tf": f'# Version {index}\nvariable "a" {{}}\n'}) for index in range(4)]
+    cache = ResultCache(str(tmp_path / "cache.db"))
+    analyzer = ProjectAnalyzer("org/repo", "", git_repo.local_path, work_dir=str(tmp_path / "work"),
+                               result_cache=cache)
+
+    mined = list(ParallelCommitMiner(analyzer, workers=2).mine(commit_hashes, cache_connection_of_worker))
+
+    assert all(pid != os.getpid() and connection != id(cache.connection) for _, (pid, connection) in mined)
+    assert cache.stats()["entries"] == len(commit_hashes)
@@ -0,0 +1,83 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from core.serving.PredictionServer import DefectPredictor, PredictionClient, PredictionServer
+
+KNOWN_COMMITS = [f"c{index}" for index in range(6)]
+
+
+class StubModel:
+    """Predicts "defective" for blocks longer than 5 lines and records its calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, X):
+        self.calls.append(len(X))
+        return [1 if row[0] > 5 else 0 for row in X]
+
+
+@pytest.fixture
+def server(stub_analyzer):
+    model = StubModel()
+    predictor = DefectPredictor(model, analyzer_factory=lambda project: stub_analyzer)
+    server = PredictionServer(predictor, port=0, max_batch_wait=0.5).start()
+    yield server, model
+    server.shutdown()
+
+
+def test_concurrent_requests_are_scored_in_one_batch(server):
+    server, model = server
+    client = PredictionClient(server.url, timeout=30)
+    commits = KNOWN_COMMITS
+    results = {}
+
+    def predict(commit_hash):
+        results[commit_hash] = client.predict("org/repo", [commit_hash])
+
+    threads = [threading.Thread(target=predict, args=(commit_hash,)) for commit_hash in commits]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # One predict call for the whole batch, with the two reported blocks of every commit
+    assert model.calls == [2 * len(commits)]
+    for commit_hash in commits:
+        [result] = results[commit_hash]
+        assert result["project"] == "org/repo"
+        assert result["commit"] == commit_hash
+        assert result["changedFiles"] == [{
+            "modifiedFilePath": f"{commit_hash}.tf",
+            "blocks": [
+                {"type": "new", "block": "resource", "block_name": "a", "block_identifiers": "resource x a",
+                 "defective": False},
+                {"type": "modified", "block": "module", "block_name": "c", "block_identifiers": "module x c",
+                 "defective": True}
+            ]
+        }]
+
+
+def test_unknown_commit_returns_an_error(server):
+    server, _ = server
+    [known, unknown] = PredictionClient(server.url, timeout=30).predict("org/repo", ["c0", "missing"])
+    assert "changedFiles" in known and "error" not in known
+    assert "not found" in unknown["error"]
+    assert "changedFiles" not in unknown
+
+
+@pytest.mark.parametrize("payload", [{"project": "org/repo", "commits": "c0"},
+                                     {"project": "org/repo", "commits": [1, 2]},
+                                     {"commits": ["c0"]}])
+def test_invalid_requests_are_rejected(server, payload):
+    server, model = server
+    request = urllib.request.Request(f"{server.url}/predict", data=json.dumps(payload).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(request, timeout=30)
+    assert error.value.code == 400
+    assert model.calls == []
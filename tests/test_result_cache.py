@@ -0,0 +1,48 @@
+import pytest
+
+from core.ProjectAnalyzer import ProjectAnalyzer
+from core.cache.ResultCache import ResultCache
+
+
+class StubProjectAnalyzer(ProjectAnalyzer):
+    """A ProjectAnalyzer without repository, measuring every file with the given status."""
+
+    def __init__(self, result_cache, status, make_changed_blocks):
+        self.repo_url = "https://github.com/org/repo.git"
+        self.file_ext_to_parse = ["tf"]
+        self.result_cache = result_cache
+        self.status = status
+        self.make_changed_blocks = make_changed_blocks
+        self.num_analyses = 0
+
+    def resolve_commit_hash(self, commit_hash):
+        return commit_hash
+
+    def helper_function_get_specific_modification(self, commit_hash):
+        return commit_hash
+
+    def identify_changed_blocks_from_commit(self, commit, only_files_to_parse=True):
+        self.num_analyses += 1
+        return self.make_changed_blocks(commit, self.status)
+
+
+@pytest.mark.parametrize("status, num_analyses", [("ok", 1), ("skipped", 1), ("timeout", 2), ("failed", 2),
+                                                  ("quarantined", 2)])
+def test_only_complete_results_are_cached(tmp_path, make_changed_blocks, status, num_analyses):
+    analyzer = StubProjectAnalyzer(ResultCache(str(tmp_path / "cache.db")), status, make_changed_blocks)
+    for _ in range(2):
+        analyzer.identify_changed_block_from_cache("a" * 40)
+    assert analyzer.num_analyses == num_analyses
+
+
+def test_non_tf_files_are_left_out_of_cached_results(tmp_path, git_repo):
+    git_repo.commit({"main.tf": 'variable "a" {}\n', "README.md": "A\n"})
+    commit_hash = git_repo.commit({"main.tf": '# The variable\nvariable "a" {}\n', "README.md": "B\n"})
+    cache = ResultCache(str(tmp_path / "cache.db"))
+    analyzer = ProjectAnalyzer("org/repo", "", git_repo.local_path, work_dir=str(tmp_path / "work"),
+                               result_cache=cache)
+
+    changed_blocks = analyzer.identify_changed_block_from_specific_commits(commit_hash, only_files_to_parse=True)
+    assert [changed_file["modifiedFilePath"] for changed_file in changed_blocks] == ["main.tf"]
+    assert changed_blocks[0]["measurements"]["after"]["status"] == "skipped"
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,100 @@
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from core.ProjectAnalyzer import ProjectAnalyzer
+from core.block_extractor.TerraMetricsLoader import BlobQuarantine, TerraMetricsLimits, TerraMetricsLoader
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+# terrametrics_project.json is not the output of a real `--project` run: it wraps the blocks of a real
+# single-file report in the assumed per-file layout. Replace it with a real run once the jar is available
+# The commit hash naming the measured snapshot directory in the fixture
+FIXTURE_COMMIT_HASH = "0123456789abcdef0123456789abcdef01234567"
+
+
+def record_timeouts(path, count):
+    quarantine = BlobQuarantine(path)
+    for _ in range(count):
+        quarantine.record_timeout("blob")
+
+
+def test_concurrent_timeouts_are_all_recorded(tmp_path):
+    path = str(tmp_path / "quarantine.json")
+    processes = [multiprocessing.Process(target=record_timeouts, args=(path, 25)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert BlobQuarantine(path).load() == {"blob": 100}
+
+
+def test_unwritable_blob_is_a_failed_measurement(tmp_path):
+    mod = SimpleNamespace(source_code='resource "x" "a" {}\n', source_code_before=None)
+    loader = TerraMetricsLoader(mod, work_dir=str(tmp_path / "missing"))
+
+    measurement = loader.measure(before=False)
+    assert measurement["status"] == "failed"
+    assert measurement["error"]
+    assert measurement["attempts"] == 0
+
+
+def load_project_results(commit_hash):
+    with open(os.path.join(FIXTURES_DIR, "terrametrics_project.json")) as file:
+        return json.loads(file.read().replace(FIXTURE_COMMIT_HASH, commit_hash))
+
+
+def test_project_results_are_split_by_file():
+    blocks_by_file = TerraMetricsLoader(None).split_project_results(load_project_results(FIXTURE_COMMIT_HASH),
+                                                                    FIXTURE_COMMIT_HASH)
+
+    assert sorted(blocks_by_file) == ["main.tf", "modules/network/variables.tf"]
+    assert [block["block_identifiers"] for block in blocks_by_file["main.tf"]] == [
+        "terraform", "provider google", "module kubernetes"]
+    assert blocks_by_file["modules/network/variables.tf"] == []
+
+
+@pytest.mark.parametrize("results", [{"head": {}, "data": [], "status": 200}, [{"data": []}], [{"file": "main.tf"}]])
+def test_unexpected_project_results_are_rejected(results):
+    with pytest.raises(ValueError):
+        TerraMetricsLoader(None).split_project_results(results, FIXTURE_COMMIT_HASH)
+
+
+def test_snapshot_leaves_out_unreported_files(tmp_path, monkeypatch, capsys):
+    repo_dir = tmp_path / "clones" / "org__repo"
+    for path in ("main.tf", "modules/network/variables.tf", "modules/network/outputs.tf"):
+        (repo_dir / path).parent.mkdir(parents=True, exist_ok=True)
+        (repo_dir / path).write_text('variable "a" {}\n')
+    subprocess.run(["git", "init", "-q"], cwd=repo_dir, check=True)
+    subprocess.run(["git", "add", "."], cwd=repo_dir, check=True)
+    subprocess.run(["git", "-c", "user.name=a", "-c", "user.email=a@b", "commit", "-q", "-m", "c"], cwd=repo_dir,
+                   check=True)
+
+    def measure_project(loader, project_dir):
+        commit_hash = os.path.basename(project_dir)
+        return loader.measurement("ok", load_project_results(commit_hash))
+
+    monkeypatch.setattr(TerraMetricsLoader, "call_service_locator_on_project", measure_project)
+    analyzer = ProjectAnalyzer("org/repo", "", str(tmp_path / "clones"), work_dir=str(tmp_path / "work"))
+    snapshot = analyzer.identify_blocks_in_snapshot("HEAD")
+
+    assert [changed_file["modifiedFilePath"] for changed_file in snapshot] == [
+        "main.tf", "modules/network/variables.tf"]
+    assert len(snapshot[0]["itsChangedBlocks"]) == 3
+    assert "modules/network/outputs.tf" in capsys.readouterr().out
+
+
+def test_blobs_killed_by_the_cpu_limit_are_quarantined(tmp_path, monkeypatch):
+    limits = TerraMetricsLimits(cpu_seconds=1, max_retries=0, quarantine_path=str(tmp_path / "quarantine.json"),
+                                quarantine_after=2)
+    mod = SimpleNamespace(source_code='resource "x" "a" {}\n', source_code_before=None)
+    loader = TerraMetricsLoader(mod, work_dir=str(tmp_path), limits=limits)
+    spin = [sys.executable, "-c", "while True: pass"]
+    monkeypatch.setattr(loader, "prepareCommand", lambda before: (spin, {"target": loader.target}))
+
+    assert [loader.measure(before=False)["status"] for _ in range(3)] == ["killed", "killed", "quarantined"]
@@ -0,0 +1,31 @@
+import time
+
+from core.mining.WorkQueue import DONE, FAILED, LEASED, PENDING, WorkQueue, run_worker
+
+
+def test_items_are_completed_and_unknown_or_incomplete_commits_fail(tmp_path, stub_analyzer):
+    queue = WorkQueue(str(tmp_path / "queue.db"), max_attempts=1)
+    assert queue.enqueue("org/repo", ["a", "missing", "incomplete", "b"]) == 4
+
+    assert run_worker(queue, lambda project: stub_analyzer, owner="w1") == 2
+
+    assert stub_analyzer.analyzed == ["a", "incomplete", "b"]
+    assert queue.counts() == {PENDING: 0, LEASED: 0, DONE: 2, FAILED: 2}
+    assert [commit_hash for _, commit_hash, _ in queue.iter_results()] == ["a", "b"]
+
+
+def test_leases_are_extended_within_a_batch(tmp_path, stub_analyzer):
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    queue.enqueue("org/repo", ["a", "b", "c"])
+    other_worker_leases = []
+
+    def slow_analysis(commit_hash):
+        # Longer than the lease: without renewal, the rest of the batch would be handed out again
+        time.sleep(0.3)
+        other_worker_leases.extend(queue.lease("w2", limit=3, lease_seconds=0.2))
+
+    stub_analyzer.on_analyze = slow_analysis
+    completed = run_worker(queue, lambda project: stub_analyzer, owner="w1", batch_size=3, lease_seconds=0.5)
+
+    assert completed == 3
+    assert other_worker_leases == []
@@ -1,5 +1,82 @@
 import re
 
+HEREDOC_DESCRIPTION_START = re.compile(r'description\s*=\s*<<-?\s*([A-Z_]+)')
+DESCRIPTION_PATTERN = re.compile(r'\s*description\s*=\s*"([^"]*)"|\s*description\s*=\s*""')
+
+
+class SpecialLinesFilter:
+    """
+    Streaming version of `UtilityChange.exclude_special_lines`: lines of one side of a diff
+    are fed one at a time, and the filter remembers whether it is inside a heredoc description
+    or a multi-line comment.
+    """
+
+    def __init__(self):
+        self.inside_multi_line_comment = False
+        self.inside_heredoc = False
+        self.heredoc_end_token = None
+
+    def is_special(self, content: str) -> bool:
+        """
+        Checks whether a changed line is a special line (empty, comment or description).
+
+        Args:
+            content (str): The content of the changed line.
+
+        Returns:
+            bool: True if the line must be excluded, False otherwise.
+        """
+        stripped_line = content.strip()
+
+        # Detect start of heredoc for description
+        heredoc_start_match = HEREDOC_DESCRIPTION_START.match(stripped_line)
+        if heredoc_start_match:
+            self.inside_heredoc = True
+            self.heredoc_end_token = heredoc_start_match.group(1)
+            return True
+
+        # Detect end of heredoc
+        if self.inside_heredoc and stripped_line == self.heredoc_end_token:
+            self.inside_heredoc = False
+            self.heredoc_end_token = None
+            return True
+
+        # Skip lines inside the heredoc, including any changes within it
+        if self.inside_heredoc:
+            return True
+
+        # Exclude empty lines
+        if not stripped_line:
+            return True
+
+        # Check if the line-concern description LINES
+        if DESCRIPTION_PATTERN.search(stripped_line):
+            return True
+
+        # Ignore single-line comments in the same line
+        if stripped_line.startswith('/*') and stripped_line.endswith('*/'):
+            return True
+
+        if stripped_line.startswith('/*') and not stripped_line.endswith('*/'):
+            self.inside_multi_line_comment = True
+            return True
+
+        if self.inside_multi_line_comment:
+            return True
+
+        if stripped_line.startswith(('#', '//')):
+            return True
+
+        # The line does not concern:
+        # -> description change = "..."
+        # -> empty line
+        # -> comments :
+        #    -> #,
+        #    -> /*....*/,
+        #    -> //,
+        #    -> /* ....\n .....\n  .....\n ......\n */
+        return False
+
 
 class UtilityChange:
 
@@ -10,73 +87,11 @@ class UtilityChange:
     #   - empty line // only whitespace
     #   - comment
     def exclude_special_lines(self, added_lines):
-        result = []
-        inside_multi_line_comment = False
-        inside_heredoc = False
-        heredoc_end_token = None
-
-        for line in added_lines:
-            stripped_line = line[1].strip()
-
-            # Detect start of heredoc for description
-            heredoc_start_match = re.match(r'description\s*=\s*<<-?\s*([A-Z_]+)', stripped_line)
-            if heredoc_start_match:
-                inside_heredoc = True
-                heredoc_end_token = heredoc_start_match.group(1)
-                continue
-
-            # Detect end of heredoc
-            if inside_heredoc and stripped_line == heredoc_end_token:
-                inside_heredoc = False
-                heredoc_end_token = None
-                continue
-
-            # Skip lines inside the heredoc, including any changes within it
-            if inside_heredoc:
-                continue
-
-            # Exclude empty lines
-            if not stripped_line:
-                continue
-
-            # Check if the line-concern description LINES
-            if self.check_description(stripped_line):
-                continue
-
-            # Ignore single-line comments in the same line
-            if stripped_line.startswith('/*') and stripped_line.endswith('*/'):
-                continue
-
-            if stripped_line.startswith('/*') and not stripped_line.endswith('*/'):
-                inside_multi_line_comment = True
-                continue
-
-            if inside_multi_line_comment:
-                continue
-
-            if inside_multi_line_comment and stripped_line.endswith('*/'):
-                inside_multi_line_comment = False
-                continue
-
-            if stripped_line.startswith(('#', '//')):
-                continue
-
-            # Add the line that does not concern:
-            # -> description change = "..."
-            # -> empty line
-            # -> comments :
-            #    -> #,
-            #    -> /*....*/,
-            #    -> //,
-            #    -> /* ....\n .....\n  .....\n ......\n */
-
-            result.append(line)
-
-        return result
+        special_lines_filter = SpecialLinesFilter()
+        return [line for line in added_lines if not special_lines_filter.is_special(line[1])]
 
     def check_description(self, contentLine):
-        description_pattern = r'\s*description\s*=\s*"([^"]*)"|\s*description\s*=\s*""'
-        if re.search(description_pattern, contentLine):
+        if DESCRIPTION_PATTERN.search(contentLine):
             return 1
 
     def identify_inducing_lines(self, tuple_to_search):
@@ -0,0 +1,58 @@
+from typing import List, Tuple
+
+
+def filter_reported_blocks(impacted_blocks: List[dict]) -> List[dict]:
+    # Fully removed blocks are not scored: they no longer exist after the change
+    return [block for block in impacted_blocks if block["type"] != "fully_removed"]
+
+
+def block_to_features(block: dict) -> List[float]:
+    # For simplicity, the block length is used as the only numeric feature
+    return [block["block"]["loc"]]
+
+
+def extract_block_features(changed_blocks: List[dict]) -> Tuple[List[List[float]], List[Tuple[str, dict]]]:
+    """
+    Builds the feature rows of the blocks reported for a commit.
+
+    Args:
+        changed_blocks (List[dict]): The output of `ProjectAnalyzer.identify_changed_block_from_specific_commits`.
+
+    Returns:
+        Tuple: The feature rows, and for each row the modified file path and the impacted block it describes.
+    """
+    X = []
+    references = []
+    for changed_file in changed_blocks:
+        for block in filter_reported_blocks(changed_file["itsChangedBlocks"]):
+            X.append(block_to_features(block))
+            references.append((changed_file["modifiedFilePath"], block))
+    return X, references
+
+
+def group_predictions_by_file(references: List[Tuple[str, dict]], predictions) -> List[dict]:
+    """
+    Groups block predictions by modified file, in the order `bootstrap.py` prints them.
+
+    Args:
+        references (List[Tuple[str, dict]]): The references returned by `extract_block_features`.
+        predictions: One predicted label (0: clean, 1: defective) per reference.
+
+    Returns:
+        List[dict]: One entry per changed TF file with its scored blocks.
+    """
+    files = []
+    by_path = {}
+    for (path, block), prediction in zip(references, predictions):
+        if path not in by_path:
+            by_path[path] = {"modifiedFilePath": path, "blocks": []}
+            files.append(by_path[path])
+        block_data = block["block"]
+        by_path[path]["blocks"].append({
+            "type": block["type"],
+            "block": block_data["block"],
+            "block_name": block_data["block_name"],
+            "block_identifiers": block_data.get("block_identifiers"),
+            "defective": int(prediction) == 1
+        })
+    return files
@@ -1,7 +1,9 @@
 import re
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, TYPE_CHECKING
 
-from pydriller import Commit, ModificationType, ModifiedFile
+if TYPE_CHECKING:
+    from pydriller import Commit, ModifiedFile
 
 
 def has_only_examples_tests_files_changed(paths):
@@ -25,7 +27,7 @@ def has_only_examples_tests_files_changed(paths):
     return False
 
 
-def get_changed_files_in_commit(commit: Commit) -> List[str]:
+def get_changed_files_in_commit(commit: "Commit") -> List[str]:
     file_names = []
     try:
         for modified_file in commit.modified_files:
@@ -44,7 +46,9 @@ def get_changed_files_in_commit(commit: Commit) -> List[str]:
     return file_names
 
 
-def skip_newly_added_file_or_removed(mod: ModifiedFile):
+def skip_newly_added_file_or_removed(mod: "ModifiedFile"):
+    from pydriller import ModificationType
+
     if mod.change_type in [ModificationType.DELETE, ModificationType.COPY, ModificationType.UNKNOWN]:
         return True
     if (mod.deleted_lines == 0 or mod.added_lines == 0) and (mod.change_type == ModificationType.RENAME):
@@ -52,7 +56,7 @@ def skip_newly_added_file_or_removed(mod: ModifiedFile):
     return False
 
 
-def is_undesired_commit(commit: Commit) -> bool:
+def is_undesired_commit(commit: "Commit") -> bool:
     if has_only_examples_tests_files_changed(
                                 get_changed_files_in_commit(commit)
                                             ):
@@ -60,25 +64,30 @@ def is_undesired_commit(commit: Commit) -> bool:
     return False
 
 
-def valid_file(mod: ModifiedFile, file_ext_to_parse):
+def valid_file(mod: "ModifiedFile", file_ext_to_parse):
     ext = mod.filename.split('.')
     if len(ext) < 2 or re.search(r'test|exampl|\b(doc)\b|\b(docs)\b|\b(spec)\b|\b(specs)\b|markdown', mod.new_path) or ext[1] not in file_ext_to_parse:
         return False
     return True
 
 
+SPECIAL_COMMIT_FILTERS = ['merg', 'revert']
+# SPECIAL_COMMIT_FILTERS = ['merg', 'revert', 'rebas', 'restor']
+# SPECIAL_COMMIT_FILTERS = ['spell', 'fmt', 'typo', 'format', 'merg', 'conflict', 'revert', 'rebas', 'restor']
+# One alternation matches all the keywords in a single scan of the message
+SPECIAL_COMMIT_PATTERN = re.compile("|".join(re.escape(word) for word in SPECIAL_COMMIT_FILTERS))
+
+
 def beSafeFromSpecialCommit(message):
     # message is a string
     # returns a boolean
-    filters = ['merg', 'revert']
-    # filters = ['merg', 'revert', 'rebas', 'restor']
-    # filters = ['spell', 'fmt', 'typo', 'format', 'merg', 'conflict', 'revert', 'rebas', 'restor']
-    safe = True
-    for word in filters:
-        if word in message:
-            safe = False
-            break
-    return safe
+    return SPECIAL_COMMIT_PATTERN.search(message) is None
+
+
+def filter_safe_commit_messages(messages: Iterable[str]) -> List[bool]:
+    # One flag per message: True if it is safe from special (merge/revert) commits
+    search = SPECIAL_COMMIT_PATTERN.search
+    return [search(message) is None for message in messages]
 
 
 def preprocess(msg, nltk, ps, stop_words, simple_preprocess):
@@ -94,10 +103,82 @@ def preprocess(msg, nltk, ps, stop_words, simple_preprocess):
     words = remove_stopwords(sentences, stop_words, simple_preprocess)
     if words:
         sentences = words[0]
-    sentences = [string for i, string in enumerate(sentences) if string not in sentences[:i]]
+    # Keep the first occurrence of each word, in order
+    sentences = list(dict.fromkeys(sentences))
     return sentences
 
 
+class CachedStemmer:
+    """
+    Wraps a stemmer (e.g. nltk's PorterStemmer) and memoizes its results: commit messages
+    reuse a small vocabulary, so most words are stemmed only once.
+    """
+
+    def __init__(self, stemmer):
+        self.stemmer = stemmer
+        self.cache = {}
+
+    def stem(self, word):
+        stemmed = self.cache.get(word)
+        if stemmed is None:
+            stemmed = self.stemmer.stem(word)
+            self.cache[word] = stemmed
+        return stemmed
+
+
+# The preprocessing state of the current worker process, set by `init_preprocess_worker`
+preprocess_worker_state = None
+
+
+def init_preprocess_worker(ps, stop_words, simple_preprocess, nltk=None):
+    global preprocess_worker_state
+    if nltk is None:
+        import nltk
+    preprocess_worker_state = (nltk, CachedStemmer(ps), frozenset(stop_words), simple_preprocess)
+
+
+def preprocess_chunk(messages):
+    nltk, ps, stop_words, simple_preprocess = preprocess_worker_state
+    return [preprocess(msg, nltk, ps, stop_words, simple_preprocess) for msg in messages]
+
+
+def preprocess_batch(messages: Iterable[str], ps, stop_words, simple_preprocess, workers: int = 1,
+                     chunksize: int = 512, nltk=None) -> List[List[str]]:
+    """
+    Preprocesses a corpus of commit messages like `preprocess`, with a memoized stemmer,
+    set-based stopwords, and each distinct message processed only once.
+
+    Args:
+        messages (Iterable[str]): The commit messages.
+        ps: The stemmer (e.g. nltk's PorterStemmer); must be picklable when workers > 1.
+        stop_words: The stopwords to remove.
+        simple_preprocess: The tokenizer (e.g. gensim's simple_preprocess); must be picklable when workers > 1.
+        workers (int): The number of worker processes (default: 1, no pool).
+        chunksize (int): The number of messages sent to a worker at once (default: 512).
+        nltk: The nltk module; imported by each worker if not given (default: None).
+
+    Returns:
+        List[List[str]]: The preprocessed words of each message, in order.
+    """
+    messages = list(messages)
+    unique_messages = list(dict.fromkeys(messages))
+
+    if workers <= 1:
+        init_preprocess_worker(ps, stop_words, simple_preprocess, nltk)
+        processed = preprocess_chunk(unique_messages)
+    else:
+        chunks = [unique_messages[i:i + chunksize] for i in range(0, len(unique_messages), chunksize)]
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=init_preprocess_worker,
+                initargs=(ps, frozenset(stop_words), simple_preprocess)
+        ) as executor:
+            processed = [words for chunk in executor.map(preprocess_chunk, chunks) for words in chunk]
+
+    words_by_message = dict(zip(unique_messages, processed))
+    return [list(words_by_message[message]) for message in messages]
+
+
 # Do lemmatization keeping only Noun, Adj, Verb, Adverb
 def stemminglAndlLemmatization(texts, ps):
     texts_out = []
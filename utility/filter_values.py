@@ -1,15 +1,44 @@
 import os
 from collections import defaultdict
-from typing import List
+from typing import List, Sequence
 from pathlib import Path
-import pandas as pd
 
 
 def filter_values_between_start_end(values: List[int], start: int, end: int):
     return [value for value in values if start < value < end]
 
 
+def count_values_between_bounds(values: Sequence[int], starts: Sequence[int], ends: Sequence[int],
+                                inclusive: bool = False) -> List[int]:
+    """
+    Counts, for every (start, end) range, the values lying inside it, in one pass over sorted values.
+    With `inclusive` False, the bounds are excluded as in `filter_values_between_start_end`.
+
+    Args:
+        values (Sequence[int]): The values to count, e.g. line numbers.
+        starts (Sequence[int]): The start of each range.
+        ends (Sequence[int]): The end of each range.
+        inclusive (bool): Count the values equal to a bound (default: False).
+
+    Returns:
+        List[int]: The number of values inside each range.
+    """
+    import numpy as np
+
+    sorted_values = np.sort(np.asarray(values, dtype=np.int64))
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if inclusive:
+        counts = np.searchsorted(sorted_values, ends, side="right") - np.searchsorted(sorted_values, starts, side="left")
+    else:
+        counts = np.searchsorted(sorted_values, ends, side="left") - np.searchsorted(sorted_values, starts, side="right")
+    # Empty or reversed ranges contain nothing
+    return np.maximum(counts, 0).tolist()
+
+
 def append_results_to_csv(results, filename):
+    import pandas as pd
+
     df = pd.DataFrame([results])
     df.to_csv(filename, mode='a', header=not os.path.exists(filename), index=False)
 